@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Backfill index attributes on existing bills in DynamoDB
+
+Bills written before the index and match attributes were added are
+missing from the indexes (and re-parsed on every match) until these
+attributes are set. Also rebuilds the dashboard summary row.
+"""
+
+from datetime import datetime
+
+import boto3
+
+dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+table = dynamodb.Table('pge-bill-automation-bills-dev')
+
+# Row with running dashboard totals; rebuilt from the bills below
+SUMMARY_BILL_ID = '__SUMMARY__'
+
+response = table.scan()
+items = response.get('Items', [])
+
+while 'LastEvaluatedKey' in response:
+    response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+    items.extend(response.get('Items', []))
+
+items = [item for item in items if item['bill_id'] != SUMMARY_BILL_ID]
+
+updated = 0
+for item in items:
+    # Attributes later code reads without parsing or scanning
+    missing = {}
+    if 'payment_status' not in item:
+        missing['payment_status'] = 'paid' if item.get('payment_confirmed') else 'unpaid'
+    if 'gsi1_pk' not in item:
+        missing['gsi1_pk'] = 'BILL'
+    if item.get('due_date'):
+        try:
+            due_dt = datetime.strptime(item['due_date'], '%m/%d/%Y')
+        except ValueError:
+            # Leave the date attributes unset; the app falls back for these rows
+            print(f"⚠ Skipping date attributes for {item['bill_id']}: bad due_date {item['due_date']!r}")
+            due_dt = None
+        
+        if due_dt and 'due_date_epoch' not in item:
+            missing['due_date_epoch'] = int(due_dt.timestamp())
+        if due_dt and 'due_date_iso' not in item:
+            missing['due_date_iso'] = due_dt.strftime('%Y-%m-%d')
+    
+    if not missing:
+        continue
+    
+    table.update_item(
+        Key={'bill_id': item['bill_id']},
+        UpdateExpression='SET ' + ', '.join(f'{name} = :{name}' for name in missing),
+        ExpressionAttributeValues={f':{name}': value for name, value in missing.items()}
+    )
+    updated += 1
+    print(f"✓ Updated: {item['bill_id']} ({', '.join(missing)})")
+
+print(f"\n✅ Backfilled {updated} of {len(items)} bills")
+
+# Rebuild the summary row (ingest and SMS sends keep it current afterwards)
+table.put_item(Item={
+    'bill_id': SUMMARY_BILL_ID,
+    'total_bills': len(items),
+    'total_amount': sum(item.get('amount', 0) for item in items),
+    'total_roommate_portion': sum(item.get('roommate_portion', 0) for item in items),
+    'sms_sent': sum(1 for item in items if item.get('sms_sent'))
+})
+print(f"✅ Rebuilt dashboard summary from {len(items)} bills")
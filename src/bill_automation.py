@@ -15,8 +15,11 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
 import boto3
+from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 
+from venmo_links import venmo_web_url
+
 # AWS clients
 dynamodb = boto3.resource('dynamodb')
 secrets_client = boto3.client('secretsmanager')
@@ -28,6 +31,14 @@ BILLS_TABLE = os.environ.get('BILLS_TABLE', 'pge-bills')
 PROCESSING_LOG_TABLE = os.environ.get('PROCESSING_LOG_TABLE', 'pge-processing-log') 
 SECRETS_ARN = os.environ.get('SECRETS_ARN')
 
+# Bills-table row holding running dashboard totals (see GmailProcessorAWS)
+SUMMARY_BILL_ID = '__SUMMARY__'
+
+# Processing-log key holding the time of the last successful Venmo payment check
+VENMO_WATERMARK_ID = 'venmo_payment_check'
+# Re-read mail slightly older than the watermark to cover delivery delays
+WATERMARK_OVERLAP = timedelta(hours=1)
+
 
 class AWSBillAutomation:
     """AWS-adapted bill automation system"""
@@ -79,7 +90,7 @@ class AWSBillAutomation:
             # Import Gmail processing for AWS Lambda
             from gmail_processor_aws import GmailProcessorAWS
             
-            processor = GmailProcessorAWS(self.settings)
+            processor = GmailProcessorAWS(self.settings, secrets_client)
             return processor.process_bills(days_back=days_back)
             
         except Exception as e:
@@ -136,12 +147,15 @@ class AWSBillAutomation:
             server.starttls()
             server.login(gmail_user, gmail_app_password)
             
+            # Same message for every gateway; only the recipient changes
+            msg = MIMEText(message_body)
+            msg['From'] = gmail_user
+            msg['Subject'] = ''  # Empty subject for SMS
+            
             # Send SMS to gateways
             for gateway in sms_gateways:
-                msg = MIMEText(message_body)
-                msg['From'] = gmail_user
+                del msg['To']
                 msg['To'] = gateway
-                msg['Subject'] = ''  # Empty subject for SMS
                 
                 try:
                     server.send_message(msg)
@@ -216,15 +230,20 @@ class AWSBillAutomation:
             # Update bill record with SMS sent status and timestamp
             try:
                 current_time = datetime.now().isoformat()
-                self.bills_table.update_item(
+                response = self.bills_table.update_item(
                     Key={'bill_id': bill_data['bill_id']},
                     UpdateExpression='SET sms_sent = :val, sms_sent_at = :sent_at, updated_at = :updated',
                     ExpressionAttributeValues={
                         ':val': True,
                         ':sent_at': current_time,
                         ':updated': current_time
-                    }
+                    },
+                    ReturnValues='UPDATED_OLD'
                 )
+                
+                # Count each bill once in the dashboard summary, not every resend
+                if not response.get('Attributes', {}).get('sms_sent'):
+                    self._count_sms_in_summary()
             except Exception as e:
                 logger.warning(f"Could not update SMS status: {e}")
             
@@ -234,6 +253,20 @@ class AWSBillAutomation:
             logger.error(f"SMS sending failed: {e}")
             return False
     
+    def _count_sms_in_summary(self):
+        """Count one more notified bill in the dashboard summary row, if it exists"""
+        try:
+            self.bills_table.update_item(
+                Key={'bill_id': SUMMARY_BILL_ID},
+                UpdateExpression='ADD sms_sent :one',
+                # Only backfill_bills.py creates the row, so it never holds partial totals
+                ConditionExpression='attribute_exists(bill_id)',
+                ExpressionAttributeValues={':one': 1}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    
     def log_processing_action(self, bill_id: str, action: str, details: str = None):
         """Log action to DynamoDB"""
         try:
@@ -249,6 +282,21 @@ class AWSBillAutomation:
             logger.error(f"Failed to log action: {e}")
     
     
+    def _get_venmo_watermark(self) -> Optional[datetime]:
+        """Get the start time of the last successful Venmo payment check"""
+        try:
+            response = self.log_table.query(
+                KeyConditionExpression=Key('bill_id').eq(VENMO_WATERMARK_ID),
+                ScanIndexForward=False,
+                Limit=1
+            )
+            items = response.get('Items', [])
+            if items:
+                return datetime.fromisoformat(items[0]['details'])
+        except Exception as e:
+            logger.warning(f"Could not load Venmo watermark: {e}")
+        return None
+    
     def check_venmo_payments(self, days_back: int = 30) -> Dict:
         """
         Check for Venmo payment confirmations and mark bills as paid
@@ -264,7 +312,7 @@ class AWSBillAutomation:
             from gmail_processor_aws import GmailProcessorAWS
             
             # Initialize Gmail processor and Venmo detector
-            gmail_processor = GmailProcessorAWS(self.settings)
+            gmail_processor = GmailProcessorAWS(self.settings, secrets_client)
             if not gmail_processor.authenticate():
                 return {
                     'payments_found': 0,
@@ -274,14 +322,17 @@ class AWSBillAutomation:
             
             venmo_detector = VenmoPaymentDetector()
             
-            # Search for Venmo payment emails
-            since_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
-            query = f'from:venmo@venmo.com after:{since_date} "you charged"'
+            # Only search mail newer than the last successful check
+            check_started = datetime.now()
+            since = check_started - timedelta(days=days_back)
+            watermark = self._get_venmo_watermark()
+            if watermark and watermark - WATERMARK_OVERLAP > since:
+                since = watermark - WATERMARK_OVERLAP
             
-            logger.info(f"Searching for Venmo payments: {query}")
+            # Search for Venmo payment emails (after: accepts epoch seconds)
+            query = f'from:venmo@venmo.com after:{int(since.timestamp())} "you charged"'
             
-            # Search for Venmo emails directly
-            venmo_emails = gmail_processor.search_emails(query, max_results=50)
+            logger.info(f"Searching for Venmo payments: {query}")
             
             results = {
                 'payments_found': 0,
@@ -289,19 +340,29 @@ class AWSBillAutomation:
                 'errors': []
             }
             
-            # Process each Venmo email
-            for email_data in venmo_emails:
-                try:
-                    payment_result = venmo_detector.process_venmo_payment_email(email_data)
-                    
-                    if payment_result['success']:
-                        results['payments_found'] += 1
-                        results['bills_updated'] += payment_result.get('bills_updated', 0)
-                        logger.info(f"Payment processed: {payment_result['message']}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing Venmo email: {e}")
-                    results['errors'].append(str(e))
+            # Process each Venmo email as its batch arrives; payment log
+            # entries are buffered into BatchWriteItem calls
+            with venmo_detector.log_table.batch_writer() as log_writer:
+                for email_data in gmail_processor.search_emails(query, max_results=None):
+                    try:
+                        payment_result = venmo_detector.process_venmo_payment_email(email_data, log_writer)
+                        
+                        if payment_result['success']:
+                            results['payments_found'] += 1
+                            results['bills_updated'] += payment_result.get('bills_updated', 0)
+                            logger.info(f"Payment processed: {payment_result['message']}")
+                        
+                    except Exception as e:
+                        logger.error(f"Error processing Venmo email: {e}")
+                        results['errors'].append(str(e))
+            
+            if gmail_processor.search_error:
+                results['errors'].append(f"Venmo email search failed: {gmail_processor.search_error}")
+            
+            # Only a complete, error-free pass may move the watermark; anything
+            # skipped would otherwise fall behind the next after: cutoff
+            if not results['errors'] and not gmail_processor.search_truncated:
+                self.log_processing_action(VENMO_WATERMARK_ID, 'watermark', check_started.isoformat())
             
             logger.info(f"Venmo payment check complete: {results['payments_found']} payments found, {results['bills_updated']} bills updated")
             return results
@@ -356,13 +417,10 @@ def run_monthly_automation(test_mode: bool = True) -> Dict:
                 
                 # Create a cleaner note with line breaks
                 note = f"Balance--${amount:.2f}\nTotal--${total:.2f}\nDue--{bill_data['due_date']}"
-                # URL encode the note properly
-                import urllib.parse
-                encoded_note = urllib.parse.quote(note)
                 
                 # Use Venmo's web URL which redirects to app on mobile
                 venmo_info = {
-                    'venmo_url': f"https://venmo.com/{venmo_username}?txn=charge&amount={amount:.2f}&note={encoded_note}",
+                    'venmo_url': venmo_web_url(venmo_username, {'txn': 'charge', 'amount': f"{amount:.2f}", 'note': note}),
                     'summary': {
                         'roommate_owes': bill_data['roommate_portion'],
                         'payment_note': note
@@ -10,30 +10,96 @@ import json
 import logging
 import base64
 import re
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from googleapiclient.model import JsonModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Created once per container and reused across warm invocations
+dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+
+# Bills-table row holding running dashboard totals, kept up to date at ingest
+SUMMARY_BILL_ID = '__SUMMARY__'
+
 # Gmail API scopes
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
+# Total due is labelled in PG&E statements; match it before falling back to a full scan
+_TOTAL_RE = re.compile(
+    r'(?:total\s*amount\s*due|amount\s*due|statement\s*balance)[^$]{0,40}\$(\d+\.\d{2})',
+    re.IGNORECASE
+)
+
+# Exact phrases in PG&E payment confirmations (not statements); matched
+# case-sensitively before the body is lowercased for the other checks
+_PROCESSED_MARKERS = ('payment has been processed', 'Confirmation Number')
+
+# Reuse a cached access token only while it has at least this much life left
+TOKEN_MIN_REMAINING = timedelta(seconds=60)
+
+# Skip authentication entirely while the cached service's token has this much left
+SERVICE_MIN_REMAINING = timedelta(seconds=300)
+
+# Gmail rate-limits batches larger than 50 requests
+GMAIL_BATCH_SIZE = 50
+# messages.list returns at most this many ids per page
+GMAIL_LIST_PAGE_SIZE = 500
+# Messages a batch could not fetch (usually 429 rate limits) are retried this often
+GMAIL_BATCH_MAX_RETRIES = 3
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_SIZE = 100
+BATCH_GET_MAX_RETRIES = 5
+
+# Credentials and the built service survive across warm Lambda invocations
+_GMAIL_CREDS = None
+_GMAIL_SERVICE = None
+
+
+class OrjsonModel(JsonModel):
+    """JsonModel that parses Gmail API responses with orjson"""
+    
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Let the stock model handle non-JSON bodies
+            return super().deserialize(content)
+        
+        if self._data_wrapper and isinstance(body, dict) and 'data' in body:
+            body = body['data']
+        return body
+
+
+# Falls back to the default stdlib json model when orjson is not installed
+GMAIL_MODEL = OrjsonModel() if orjson else None
+
+
 class GmailProcessorAWS:
     """Gmail processor adapted for AWS Lambda environment"""
     
-    def __init__(self, settings: Dict):
+    def __init__(self, settings: Dict, secrets_client=None):
         self.settings = settings
+        # The client settings were loaded with, reused to store refreshed tokens
+        self.secrets_client = secrets_client
         self.service = None
-        self.dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+        self.search_error = None
+        self.search_truncated = False
+        self.dynamodb = dynamodb
         self.bills_table = self.dynamodb.Table(os.environ.get('BILLS_TABLE', 'pge-bill-automation-bills-dev'))
         
     def authenticate(self) -> bool:
@@ -43,6 +109,13 @@ class GmailProcessorAWS:
         Returns:
             True if authentication successful
         """
+        global _GMAIL_CREDS, _GMAIL_SERVICE
+        
+        if _GMAIL_SERVICE is not None and _GMAIL_CREDS is not None \
+                and self._has_time_left(_GMAIL_CREDS.expiry, SERVICE_MIN_REMAINING):
+            self.service = _GMAIL_SERVICE
+            return True
+        
         try:
             # Get Gmail credentials from settings (loaded from Secrets Manager)
             client_id = self.settings.get('gmail_client_id')
@@ -53,25 +126,32 @@ class GmailProcessorAWS:
                 logger.error("Gmail credentials not found in settings")
                 return False
                 
-            # Create credentials from OAuth2 data
-            creds_data = {
-                'client_id': client_id,
-                'client_secret': client_secret,
-                'refresh_token': refresh_token,
-                'type': 'authorized_user'
-            }
-            creds = Credentials.from_authorized_user_info(creds_data, SCOPES)
+            creds = self._load_cached_credentials(client_id, client_secret, refresh_token)
+            
+            if creds is None:
+                # Create credentials from OAuth2 data
+                creds_data = {
+                    'client_id': client_id,
+                    'client_secret': client_secret,
+                    'refresh_token': refresh_token,
+                    'type': 'authorized_user'
+                }
+                creds = Credentials.from_authorized_user_info(creds_data, SCOPES)
+                
+                # Refresh if needed
+                if not creds.valid:
+                    if creds.refresh_token:
+                        creds.refresh(Request())
+                        self._store_access_token(creds)
+                    else:
+                        logger.error("Gmail credentials expired and cannot be refreshed")
+                        return False
             
-            # Refresh if needed
-            if not creds.valid:
-                if creds.expired and creds.refresh_token:
-                    creds.refresh(Request())
-                else:
-                    logger.error("Gmail credentials expired and cannot be refreshed")
-                    return False
+            _GMAIL_CREDS = creds
             
             # Build the service
-            self.service = build('gmail', 'v1', credentials=creds)
+            self.service = build('gmail', 'v1', credentials=creds, model=GMAIL_MODEL)
+            _GMAIL_SERVICE = self.service
             logger.info("Gmail API authentication successful")
             return True
             
@@ -79,6 +159,67 @@ class GmailProcessorAWS:
             logger.error(f"Gmail authentication failed: {e}")
             return False
     
+    def _load_cached_credentials(self, client_id: str, client_secret: str,
+                                 refresh_token: str) -> Optional[Credentials]:
+        """Return credentials from a still-valid access token, skipping the refresh round-trip"""
+        if _GMAIL_CREDS is not None and self._has_time_left(_GMAIL_CREDS.expiry):
+            return _GMAIL_CREDS
+        
+        token = self.settings.get('gmail_access_token')
+        expiry_str = self.settings.get('gmail_token_expiry')
+        if not token or not expiry_str:
+            return None
+        
+        try:
+            expiry = datetime.fromisoformat(expiry_str)
+        except ValueError:
+            logger.warning(f"Ignoring invalid cached token expiry: {expiry_str}")
+            return None
+        
+        if not self._has_time_left(expiry):
+            return None
+        
+        logger.info("Using cached Gmail access token")
+        return Credentials(
+            token=token,
+            refresh_token=refresh_token,
+            token_uri='https://oauth2.googleapis.com/token',
+            client_id=client_id,
+            client_secret=client_secret,
+            scopes=SCOPES,
+            expiry=expiry
+        )
+    
+    @staticmethod
+    def _has_time_left(expiry: Optional[datetime], margin: timedelta = TOKEN_MIN_REMAINING) -> bool:
+        """Check an access token expiry (naive UTC, as google-auth uses) against a reuse margin"""
+        return expiry is not None and expiry - datetime.utcnow() > margin
+    
+    def _store_access_token(self, creds: Credentials):
+        """Write a freshly refreshed access token back to Secrets Manager for the next cold start"""
+        secrets_arn = os.environ.get('SECRETS_ARN')
+        if not secrets_arn or not creds.token or not creds.expiry:
+            return
+        
+        try:
+            if self.secrets_client is None:
+                self.secrets_client = boto3.client('secretsmanager')
+            
+            # Re-read the secret so in-memory setting overrides are not persisted.
+            # Secrets Manager has no conditional put, so a settings edit saved
+            # between this read and the put is overwritten.
+            response = self.secrets_client.get_secret_value(SecretId=secrets_arn)
+            secret = json.loads(response['SecretString'])
+            secret['gmail_access_token'] = creds.token
+            secret['gmail_token_expiry'] = creds.expiry.isoformat()
+            
+            self.secrets_client.put_secret_value(SecretId=secrets_arn, SecretString=json.dumps(secret))
+            logger.info("Stored refreshed Gmail access token in Secrets Manager")
+            
+        except (ClientError, BotoCoreError, ValueError, KeyError) as e:
+            # Best effort: the refreshed credentials work either way
+            logger.warning(f"Could not store Gmail access token: {e}")
+    
     def process_bills(self, days_back: int = 30) -> Dict:
         """
         Process PG&E bills from Gmail
@@ -106,34 +247,47 @@ class GmailProcessorAWS:
             emails = self._search_pge_emails(start_date, end_date)
             logger.info(f"Found {len(emails)} PG&E emails to process")
             
+            # Emails Gmail would not return even after retries count as one error
+            fetch_errors = 1 if self.search_error else 0
+            
+            if not emails:
+                return {'processed': 0, 'duplicates': 0, 'errors': fetch_errors, 'new_bills': []}
+            
             results = {
                 'processed': 0,
                 'duplicates': 0,
-                'errors': 0,
+                'errors': fetch_errors,
                 'new_bills': []
             }
             
+            bills = []
             for email_data in emails:
                 try:
                     bill_info = self._extract_bill_info(email_data)
                     if bill_info:
-                        # Check for duplicates
-                        if self._is_duplicate_bill(bill_info):
-                            results['duplicates'] += 1
-                            logger.info(f"Skipping duplicate bill for {bill_info['due_date']}")
-                            continue
-                        
-                        # Save to DynamoDB
-                        saved_bill = self._save_bill_to_db(bill_info)
-                        if saved_bill:
-                            results['new_bills'].append(saved_bill)
-                            results['processed'] += 1
-                            logger.info(f"Processed new bill: ${bill_info['amount']} due {bill_info['due_date']}")
+                        bills.append(bill_info)
                         
                 except Exception as e:
                     logger.error(f"Error processing email {email_data.get('id', 'unknown')}: {e}")
                     results['errors'] += 1
             
+            # Check for duplicates in one batched read instead of a GetItem per email
+            existing_ids = self._existing_bill_ids([bill_info['bill_id'] for bill_info in bills])
+            
+            for bill_info in bills:
+                if bill_info['bill_id'] in existing_ids:
+                    results['duplicates'] += 1
+                    logger.info(f"Skipping duplicate bill for {bill_info['due_date']}")
+                    continue
+                
+                # Save to DynamoDB
+                saved_bill = self._save_bill_to_db(bill_info)
+                if saved_bill:
+                    existing_ids.add(bill_info['bill_id'])
+                    results['new_bills'].append(saved_bill)
+                    results['processed'] += 1
+                    logger.info(f"Processed new bill: ${bill_info['amount']} due {bill_info['due_date']}")
+            
             return results
             
         except Exception as e:
@@ -147,6 +301,8 @@ class GmailProcessorAWS:
     
     def _search_pge_emails(self, start_date: datetime, end_date: datetime) -> List[Dict]:
         """Search for PG&E bill emails in date range"""
+        self.search_error = None
+        
         try:
             # Format dates for Gmail search
             after_date = start_date.strftime('%Y/%m/%d')
@@ -164,29 +320,63 @@ class GmailProcessorAWS:
             ).execute()
             
             messages = results.get('messages', [])
-            emails = []
-            
-            for message in messages:
-                try:
-                    # Get full message details
-                    email_detail = self.service.users().messages().get(
-                        userId='me',
-                        id=message['id'],
-                        format='full'
-                    ).execute()
-                    
-                    emails.append(email_detail)
-                    
-                except HttpError as e:
-                    logger.warning(f"Could not fetch email {message['id']}: {e}")
-                    continue
-            
-            return emails
+            return list(self._iter_messages(messages))
             
         except Exception as e:
             logger.error(f"Gmail search failed: {e}")
             return []
     
+    def _iter_messages(self, messages: List[Dict]) -> Iterator[Dict]:
+        """
+        Get full message details with batched requests instead of one round-trip per message
+        
+        Messages are yielded as each batch completes, so callers can act on the
+        first batch before later ones are fetched. Messages that still fail
+        after GMAIL_BATCH_MAX_RETRIES retries set search_error.
+        """
+        for start in range(0, len(messages), GMAIL_BATCH_SIZE):
+            pending = [message['id'] for message in messages[start:start + GMAIL_BATCH_SIZE]]
+            
+            for attempt in range(GMAIL_BATCH_MAX_RETRIES + 1):
+                if attempt:
+                    # Back off before retrying rate-limited fetches
+                    time.sleep(min(0.5 * 2 ** attempt, 8))
+                
+                emails, pending = self._fetch_batch(pending)
+                yield from emails
+                
+                if not pending:
+                    break
+            else:
+                logger.error(f"Gave up fetching {len(pending)} emails: {pending}")
+                self.search_error = f"Could not fetch {len(pending)} emails"
+    
+    def _fetch_batch(self, message_ids: List[str]) -> Tuple[List[Dict], List[str]]:
+        """Fetch full messages in one batch request; returns (emails, ids that failed)"""
+        emails = []
+        failed = []
+        
+        def on_message(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"Could not fetch email {request_id}: {exception}")
+                failed.append(request_id)
+            else:
+                emails.append(response)
+        
+        batch = self.service.new_batch_http_request(callback=on_message)
+        for message_id in message_ids:
+            batch.add(
+                self.service.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='full'
+                ),
+                request_id=message_id
+            )
+        batch.execute()
+        
+        return emails, failed
+    
     def _is_bill_statement(self, email_data: Dict) -> bool:
         """Check if email is actually a bill statement (not payment confirmation, etc)"""
         try:
@@ -212,19 +402,24 @@ class GmailProcessorAWS:
             
             # Check for payment confirmation indicators (should NOT be present)
             payment_indicators = [
-                'payment has been processed',
-                'Confirmation Number',
+                *_PROCESSED_MARKERS,
                 'Date of Payment',
                 'Payment Amount',
                 'We thank you for being',
                 'previously scheduled recurring payment'
             ]
             
+            # Cheap reject on the exact phrases payment confirmations use
+            if any(marker in body for marker in _PROCESSED_MARKERS):
+                return False
+            
+            body_lower = body.lower()
+            
             # Must have at least one bill indicator
-            has_bill_indicator = any(indicator.lower() in body.lower() for indicator in bill_indicators)
+            has_bill_indicator = any(indicator.lower() in body_lower for indicator in bill_indicators)
             
             # Must NOT have payment indicators
-            has_payment_indicator = any(indicator.lower() in body.lower() for indicator in payment_indicators)
+            has_payment_indicator = any(indicator.lower() in body_lower for indicator in payment_indicators)
             
             return has_bill_indicator and not has_payment_indicator
             
@@ -245,16 +440,20 @@ class GmailProcessorAWS:
             if not body:
                 return None
             
-            # Extract bill amount
-            amount_pattern = r'\$(\d+\.\d{2})'
-            amount_matches = re.findall(amount_pattern, body)
-            
-            if not amount_matches:
-                logger.warning("Could not find bill amount in email")
-                return None
-            
-            # PG&E emails typically have the total amount as the largest value
-            bill_amount = max([float(amount) for amount in amount_matches])
+            # Extract bill amount from the labelled total first
+            total_match = _TOTAL_RE.search(body)
+            if total_match:
+                bill_amount = float(total_match.group(1))
+            else:
+                amount_pattern = r'\$(\d+\.\d{2})'
+                amount_matches = re.findall(amount_pattern, body)
+                
+                if not amount_matches:
+                    logger.warning("Could not find bill amount in email")
+                    return None
+                
+                # PG&E emails typically have the total amount as the largest value
+                bill_amount = max([float(amount) for amount in amount_matches])
             
             # Extract due date
             due_date = self._extract_due_date(body)
@@ -269,6 +468,8 @@ class GmailProcessorAWS:
             roommate_portion = bill_amount * roommate_ratio
             my_portion = bill_amount * my_ratio
             
+            due_dt = datetime.strptime(due_date, '%m/%d/%Y')
+            
             # Create bill info (convert floats to Decimal for DynamoDB)
             bill_id = f"pge_{due_date.replace('/', '_')}_{int(bill_amount * 100)}"
             bill_info = {
@@ -276,11 +477,16 @@ class GmailProcessorAWS:
                 'email_id': email_data['id'],
                 'amount': Decimal(str(round(bill_amount, 2))),
                 'due_date': due_date,
+                'due_date_epoch': int(due_dt.timestamp()),
+                # Due-date GSI keys: one partition, ISO dates sort chronologically
+                'gsi1_pk': 'BILL',
+                'due_date_iso': due_dt.strftime('%Y-%m-%d'),
                 'roommate_portion': Decimal(str(round(roommate_portion, 2))),
                 'my_portion': Decimal(str(round(my_portion, 2))),
                 'email_body': body,
                 'processed_date': datetime.now().isoformat(),
-                'status': 'processed'
+                'status': 'processed',
+                'payment_status': 'unpaid'
             }
             
             return bill_info
@@ -294,39 +500,49 @@ class GmailProcessorAWS:
         try:
             payload = email_data.get('payload', {})
             
-            # Check if it's multipart
-            if 'parts' in payload:
-                for part in payload['parts']:
-                    if part.get('mimeType') == 'text/plain':
-                        data = part.get('body', {}).get('data')
-                        if data:
-                            return base64.urlsafe_b64decode(data).decode('utf-8')
-                    elif part.get('mimeType') == 'text/html':
-                        data = part.get('body', {}).get('data')
-                        if data:
-                            # For HTML, we'll use it as backup
-                            html_content = base64.urlsafe_b64decode(data).decode('utf-8')
-                            # Strip HTML tags for text processing
-                            import re
-                            return re.sub('<[^<]+?>', '', html_content)
-            else:
-                # Single part message
-                data = payload.get('body', {}).get('data')
-                if data:
-                    content = base64.urlsafe_b64decode(data).decode('utf-8')
-                    if payload.get('mimeType') == 'text/html':
-                        # Strip HTML tags
-                        import re
-                        return re.sub('<[^<]+?>', '', content)
-                    else:
-                        return content
+            mime_type, data = self._find_text_part(payload)
+            if not data:
+                return None
             
-            return None
+            content = base64.urlsafe_b64decode(data.encode('ascii')).decode('utf-8')
+            if mime_type == 'text/html':
+                # Strip HTML tags for text processing
+                return re.sub('<[^<]+?>', '', content)
+            return content
             
         except Exception as e:
             logger.error(f"Failed to extract email body: {e}")
             return None
     
+    def _find_text_part(self, payload: Dict) -> Tuple[Optional[str], Optional[str]]:
+        """Find the best text part in one walk, preferring text/plain over text/html"""
+        html_part = (None, None)
+        stack = [payload]
+        
+        while stack:
+            part = stack.pop()
+            mime_type = part.get('mimeType', '')
+            
+            if 'parts' in part:
+                # Nested multipart - keep original part order
+                stack.extend(reversed(part['parts']))
+                continue
+            
+            data = part.get('body', {}).get('data')
+            if not data:
+                continue
+            
+            if mime_type == 'text/plain':
+                return mime_type, data
+            if mime_type == 'text/html' and html_part[1] is None:
+                # For HTML, we'll use it as backup
+                html_part = (mime_type, data)
+            elif part is payload:
+                # Single part message without a text mime type
+                return mime_type, data
+        
+        return html_part
+    
     def _extract_due_date(self, body: str) -> Optional[str]:
         """Extract due date from email body"""
         try:
@@ -356,83 +572,141 @@ class GmailProcessorAWS:
             logger.error(f"Failed to extract due date: {e}")
             return None
     
-    def _is_duplicate_bill(self, bill_info: Dict) -> bool:
-        """Check if bill already exists in DynamoDB"""
+    def _existing_bill_ids(self, bill_ids: List[str]) -> set:
+        """Return which of these bill_ids are already in DynamoDB, using BatchGetItem"""
+        table_name = self.bills_table.name
+        # BatchGetItem rejects duplicate keys
+        keys = [{'bill_id': bill_id} for bill_id in dict.fromkeys(bill_ids)]
+        existing = set()
+        
         try:
-            # Check for existing bill with same bill_id (more reliable than amount/date)
-            response = self.bills_table.get_item(
-                Key={'bill_id': bill_info['bill_id']}
-            )
-            
-            return 'Item' in response
+            for start in range(0, len(keys), BATCH_GET_SIZE):
+                request_items = {table_name: {
+                    'Keys': keys[start:start + BATCH_GET_SIZE],
+                    'ProjectionExpression': 'bill_id'
+                }}
+                
+                for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+                    if attempt:
+                        # Back off before retrying keys DynamoDB throttled
+                        time.sleep(min(0.05 * 2 ** attempt, 2))
+                    
+                    response = self.dynamodb.batch_get_item(RequestItems=request_items)
+                    existing.update(item['bill_id'] for item in response.get('Responses', {}).get(table_name, []))
+                    
+                    request_items = response.get('UnprocessedKeys')
+                    if not request_items:
+                        break
+                else:
+                    logger.warning(f"Gave up on {len(request_items[table_name]['Keys'])} unprocessed bill keys")
             
         except Exception as e:
-            logger.error(f"Failed to check for duplicate: {e}")
-            return False
+            # The conditional put in _save_bill_to_db still refuses duplicates
+            logger.error(f"Failed to check for duplicates: {e}")
+        
+        return existing
     
     def _save_bill_to_db(self, bill_info: Dict) -> Optional[Dict]:
         """Save bill to DynamoDB"""
         try:
-            # Add timestamp
-            bill_info['created_at'] = datetime.now().isoformat()
-            bill_info['updated_at'] = datetime.now().isoformat()
-            
-            # Save to DynamoDB
-            self.bills_table.put_item(Item=bill_info)
+            # Add timestamp (one clock read so created_at == updated_at)
+            now = datetime.now().isoformat()
+            bill_info['created_at'] = now
+            bill_info['updated_at'] = now
+            
+            # Save to DynamoDB; the condition stops an overlapping run that also
+            # passed the duplicate check from saving (and counting) the bill twice
+            self.bills_table.put_item(
+                Item=bill_info,
+                ConditionExpression='attribute_not_exists(bill_id)'
+            )
+            self._add_to_summary(bill_info)
             
             logger.info(f"Saved bill to DynamoDB: {bill_info['bill_id']}")
             return bill_info
             
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logger.info(f"Bill {bill_info['bill_id']} was already saved by another run")
+            else:
+                logger.error(f"Failed to save bill to DynamoDB: {e}")
+            return None
+            
         except Exception as e:
             logger.error(f"Failed to save bill to DynamoDB: {e}")
             return None
     
-    def search_emails(self, query: str, max_results: int = 50) -> List[Dict]:
+    def _add_to_summary(self, bill_info: Dict):
+        """Add a new bill to the dashboard summary row (atomic ADD, so concurrent runs are safe)"""
+        try:
+            self.bills_table.update_item(
+                Key={'bill_id': SUMMARY_BILL_ID},
+                UpdateExpression='ADD total_bills :one, total_amount :amount, total_roommate_portion :roommate',
+                # Only backfill_bills.py creates the row, so it never holds partial totals
+                ConditionExpression='attribute_exists(bill_id)',
+                ExpressionAttributeValues={
+                    ':one': 1,
+                    ':amount': bill_info['amount'],
+                    ':roommate': bill_info['roommate_portion']
+                }
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.warning(f"Could not update bill summary: {e}")
+        except Exception as e:
+            logger.warning(f"Could not update bill summary: {e}")
+    
+    def search_emails(self, query: str, max_results: Optional[int] = 50) -> Iterator[Dict]:
         """
         Search emails with a custom Gmail query
         
         Args:
             query: Gmail search query
-            max_results: Maximum number of results to return
+            max_results: Maximum number of results to return (None pages through every match)
             
-        Returns:
-            List of email data dictionaries
+        Yields:
+            Email data dictionaries as each batch of messages is fetched
+            
+        A failed search ends the iteration early and sets search_error;
+        search_truncated is set when more than max_results emails matched.
         """
+        self.search_error = None
+        self.search_truncated = False
+        
         try:
             if not self.service:
                 if not self.authenticate():
-                    return []
+                    self.search_error = 'Gmail authentication failed'
+                    return
             
             logger.info(f"Searching emails with query: {query}")
             
-            # Search emails
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
-            
-            messages = results.get('messages', [])
-            emails = []
+            # Search emails, following nextPageToken until max_results ids are listed
+            messages = []
+            page_token = None
+            while True:
+                page_size = GMAIL_LIST_PAGE_SIZE
+                if max_results is not None:
+                    page_size = min(page_size, max_results - len(messages))
+                
+                results = self.service.users().messages().list(
+                    userId='me',
+                    q=query,
+                    maxResults=page_size,
+                    pageToken=page_token
+                ).execute()
+                
+                messages.extend(results.get('messages', []))
+                page_token = results.get('nextPageToken')
+                if not page_token or (max_results is not None and len(messages) >= max_results):
+                    break
             
-            for message in messages:
-                try:
-                    # Get full message details
-                    email_detail = self.service.users().messages().get(
-                        userId='me',
-                        id=message['id'],
-                        format='full'
-                    ).execute()
-                    
-                    emails.append(email_detail)
-                    
-                except HttpError as e:
-                    logger.warning(f"Could not fetch email {message['id']}: {e}")
-                    continue
+            self.search_truncated = bool(page_token)
+            logger.info(f"Found {len(messages)} emails matching query"
+                        f"{' (truncated)' if self.search_truncated else ''}")
             
-            logger.info(f"Found {len(emails)} emails matching query")
-            return emails
+            yield from self._iter_messages(messages)
             
         except Exception as e:
             logger.error(f"Email search failed: {e}")
-            return []
\ No newline at end of file
+            self.search_error = str(e)
@@ -5,11 +5,54 @@ AWS Lambda handler for PG&E Bill Automation
 import json
 import logging
 import os
-from bill_automation import run_monthly_automation
+from datetime import datetime
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# bill_automation (boto3, Gmail client, Venmo detector) is imported on first use
+# and kept for warm invocations
+_run = None
+
+# Job rows the web UI polls for async (Event) invocations that carry a job_id
+JOBS_TABLE = os.environ.get('JOBS_TABLE')
+_jobs_table = None
+
+# Shared by success and error responses
+_RESP_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+
+def _dumps(obj) -> str:
+    """Compact JSON; default=str covers Decimal values from DynamoDB"""
+    return json.dumps(obj, separators=(',', ':'), default=str)
+
+
+def _update_job(job_id, status, **fields):
+    """Record job progress for the web UI; a failed update never fails the run"""
+    global _jobs_table
+    
+    if not job_id or not JOBS_TABLE:
+        return
+    
+    try:
+        if _jobs_table is None:
+            import boto3
+            _jobs_table = boto3.resource('dynamodb').Table(JOBS_TABLE)
+        
+        # 'status' is a DynamoDB reserved word, so every name goes through #aliases
+        fields.update(status=status, updated_at=datetime.now().isoformat())
+        _jobs_table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression='SET ' + ', '.join(f'#{name} = :{name}' for name in fields),
+            ExpressionAttributeNames={f'#{name}': name for name in fields},
+            ExpressionAttributeValues={f':{name}': value for name, value in fields.items()}
+        )
+    except Exception as e:
+        logger.warning(f"Could not update job {job_id}: {e}")
+
 
 def lambda_handler(event, context):
     """
@@ -22,42 +65,46 @@ def lambda_handler(event, context):
     Returns:
         Response with status and results
     """
+    global _run
+    
+    job_id = event.get('job_id')
+    
     try:
-        logger.info(f"Lambda invoked with event: {json.dumps(event)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Lambda invoked with event: {_dumps(event)}")
         
         # Determine test mode from event or environment
         test_mode = event.get('test_mode', os.environ.get('TEST_MODE', 'false').lower() == 'true')
         
         # Run the automation
-        results = run_monthly_automation(test_mode=test_mode)
+        _update_job(job_id, 'running')
+        if _run is None:
+            from bill_automation import run_monthly_automation as _run
+        results = _run(test_mode=test_mode)
         
         # Log results
-        logger.info(f"Automation results: {json.dumps(results)}")
+        logger.info(f"Automation results: {_dumps(results)}")
+        _update_job(job_id, 'succeeded', result=_dumps(results))
         
         # Return successful response
         return {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': _dumps({
                 'message': 'Automation completed successfully',
                 'results': results
             }),
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            }
+            'headers': _RESP_HEADERS
         }
         
     except Exception as e:
         logger.error(f"Lambda execution failed: {str(e)}", exc_info=True)
+        _update_job(job_id, 'failed', error=str(e))
         
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': _dumps({
                 'message': 'Automation failed',
                 'error': str(e)
             }),
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            }
+            'headers': _RESP_HEADERS
         }
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""
+Venmo link encoding shared by the Lambda (SMS/email links) and the web UI
+
+Both sides build links for the same bill, so they must quote them the same way.
+"""
+
+from typing import Dict
+from urllib.parse import quote, urlencode
+
+
+def venmo_query(params: Dict) -> str:
+    """URL-encode Venmo link parameters
+
+    quote (not quote_plus) keeps spaces as %20, which the Venmo app expects,
+    and '/' is left as is so due dates read naturally in the note.
+    """
+    return urlencode(params, quote_via=quote, safe='/')
+
+
+def venmo_web_url(username: str, params: Dict) -> str:
+    """venmo.com link for a user; it redirects to the app on mobile"""
+    return f"https://venmo.com/{quote(username)}?{venmo_query(params)}"
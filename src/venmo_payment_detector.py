@@ -6,23 +6,84 @@ Detects Venmo payment confirmations from venmo@venmo.com emails and matches them
 to pending PG&E bills by amount and timeframe to avoid false positives.
 """
 
+import os
 import re
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 import boto3
+from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 
+# GSI on the bills table (PK payment_status, SK roommate_portion), e.g.
+# 'unpaid-by-amount-index'. Unpaid bills are scanned when it is not configured.
+UNPAID_BILLS_INDEX = os.environ.get('UNPAID_BILLS_INDEX')
+
+DEFAULT_REGION = 'us-west-2'
+
+# Created once per container and shared by every detector instance
+_DDB = boto3.resource('dynamodb', region_name=DEFAULT_REGION)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Venmo confirmations are short; only this much of the body is searched
+MAX_BODY_CHARS = 8 * 1024
+
+# Payment email patterns, compiled once per container instead of per email.
+# re.ASCII keeps \d and \s to plain ASCII classes.
+_PAYER_RE = re.compile(r'You charged\s+([^\n]+)', re.IGNORECASE | re.ASCII)
+
+# First charge amount in one pass: $1,234.56 or $123.45 (covers "private+ $123.45")
+_AMOUNT_RE = re.compile(r'\$\s*(\d{1,3}(?:,\d{3})+\.\d{2}|\d+\.\d{2})', re.ASCII)
+
+# Tried in order: the body can also carry other dates (e.g. a billing period in the note).
+# Named groups let the date be built directly instead of trying strptime formats.
+_DATE_RES = [
+    re.compile(r'(?P<mon>[A-Za-z]{3})\s+(?P<day>\d{1,2}),?\s+(?P<year>\d{4})', re.ASCII),  # Sep 12, 2024 / Sep 12 2024
+    re.compile(r'(?P<month>\d{1,2})/(?P<day>\d{1,2})/(?P<year>\d{4})', re.ASCII),          # 9/12/2024
+]
+
+_MONTHS = {
+    name: number for number, name in enumerate(
+        ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)
+}
+
+_PAYMENT_ID_RE = re.compile(r'Payment ID:\s*(\d+)', re.IGNORECASE | re.ASCII)
+
+# Payment confirmation keywords
+_CONFIRM_KEYWORDS_RE = re.compile(
+    r'you charged|transfer date and amount|money credited to your venmo account|payment id:',
+    re.IGNORECASE
+)
+
+# Lines after the payer name, up to the transfer details. The name is the first
+# non-blank text after "You charged", on that line or the next; [^\n]+ keeps it
+# on one line so it never runs into the note.
+_NOTE_RE = re.compile(r'You charged\s*[^\n]+\n(.*?)(?:Transfer Date|\Z)', re.DOTALL)
+
 class VenmoPaymentDetector:
     """Detect and process Venmo payment confirmations"""
     
-    def __init__(self, region='us-west-2'):
-        self.dynamodb = boto3.resource('dynamodb', region_name=region)
+    def __init__(self, region=DEFAULT_REGION):
+        if os.environ.get('USE_DAX', 'false').lower() == 'true':
+            # Write-through DAX cache in front of the bills and log tables
+            from amazondax import AmazonDaxClient
+            self.dynamodb = AmazonDaxClient.resource(
+                endpoint_url=os.environ['DAX_ENDPOINT'],
+                region_name=region
+            )
+        elif region == DEFAULT_REGION:
+            self.dynamodb = _DDB
+        else:
+            self.dynamodb = boto3.resource('dynamodb', region_name=region)
         self.bills_table = self.dynamodb.Table('pge-bill-automation-bills-dev')
         self.log_table = self.dynamodb.Table('pge-processing-log')
+        # Unpaid bills from the first scan in this run; a new detector is built per
+        # invocation so bills saved since the last run are always seen
+        self._unpaid_bills = None
         
     def is_venmo_payment_email(self, email_data: Dict) -> bool:
         """Check if email is a Venmo payment confirmation"""
@@ -34,20 +95,17 @@ class VenmoPaymentDetector:
         if 'venmo@venmo.com' not in sender:
             return False
             
-        # Check for payment confirmation keywords
-        payment_keywords = [
-            'you charged',
-            'transfer date and amount',
-            'money credited to your venmo account',
-            'payment id:'
-        ]
-        
-        body = email_data.get('body', '').lower()
-        
-        # Must contain at least 2 payment confirmation keywords
-        keyword_count = sum(1 for keyword in payment_keywords if keyword in body)
+        # Must contain at least 2 distinct payment confirmation keywords;
+        # one case-insensitive pass avoids lowercasing a copy of the body.
+        # Same MAX_BODY_CHARS window as extract_payment_info so the two agree.
+        body = email_data.get('body', '')[:MAX_BODY_CHARS]
+        keywords_found = set()
+        for match in _CONFIRM_KEYWORDS_RE.finditer(body):
+            keywords_found.add(match.group(0).lower())
+            if len(keywords_found) >= 2:
+                return True
         
-        return keyword_count >= 2
+        return False
     
     def extract_payment_info(self, email_body: str) -> Optional[Dict]:
         """Extract payment information from Venmo confirmation email"""
@@ -55,26 +113,20 @@ class VenmoPaymentDetector:
         try:
             payment_info = {}
             
+            # Bound regex work on long HTML bodies or quoted replies
+            email_body = email_body[:MAX_BODY_CHARS]
+            
             # Extract payer name (after "You charged")
-            payer_match = re.search(r'You charged\s+([^\n]+)', email_body, re.IGNORECASE)
+            payer_match = _PAYER_RE.search(email_body)
             if payer_match:
                 payment_info['payer_name'] = payer_match.group(1).strip()
             
             # Extract payment amount (look for $ followed by decimal amount)
-            # Pattern: $XXX.XX or $X,XXX.XX
-            amount_patterns = [
-                r'\$\s*(\d{1,3}(?:,\d{3})*\.\d{2})',  # $123.45 or $1,234.56
-                r'\$\s*(\d+\.\d{2})',                   # $123.45
-                r'private\+\s*\$\s*(\d+\.\d{2})',      # private+ $123.45
-            ]
-            
             amount = None
-            for pattern in amount_patterns:
-                amount_match = re.search(pattern, email_body, re.IGNORECASE)
-                if amount_match:
-                    amount_str = amount_match.group(1).replace(',', '')
-                    amount = float(amount_str)
-                    break
+            amount_match = _AMOUNT_RE.search(email_body)
+            if amount_match:
+                amount_str = amount_match.group(1).replace(',', '')
+                amount = Decimal(amount_str)
             
             if not amount:
                 logger.warning("Could not extract payment amount from Venmo email")
@@ -83,29 +135,14 @@ class VenmoPaymentDetector:
             payment_info['amount'] = amount
             
             # Extract payment date
-            date_patterns = [
-                r'([A-Za-z]{3}\s+\d{1,2},\s+\d{4})',           # Sep 12, 2024
-                r'(\d{1,2}/\d{1,2}/\d{4})',                     # 9/12/2024
-                r'([A-Za-z]{3}\s+\d{1,2}\s+\d{4})',            # Sep 12 2024
-            ]
-            
             payment_date = None
-            for pattern in date_patterns:
-                date_match = re.search(pattern, email_body)
-                if date_match:
-                    try:
-                        date_str = date_match.group(1)
-                        # Try different date formats
-                        for fmt in ['%b %d, %Y', '%m/%d/%Y', '%b %d %Y']:
-                            try:
-                                payment_date = datetime.strptime(date_str, fmt)
-                                break
-                            except ValueError:
-                                continue
-                        if payment_date:
-                            break
-                    except Exception as e:
-                        logger.warning(f"Error parsing date {date_match.group(1)}: {e}")
+            for pattern in _DATE_RES:
+                for date_match in pattern.finditer(email_body):
+                    payment_date = self._date_from_match(date_match)
+                    if payment_date:
+                        break
+                if payment_date:
+                    break
             
             if not payment_date:
                 # Default to today if we can't parse the date
@@ -115,19 +152,16 @@ class VenmoPaymentDetector:
             payment_info['payment_date'] = payment_date
             
             # Extract Payment ID
-            payment_id_match = re.search(r'Payment ID:\s*(\d+)', email_body, re.IGNORECASE)
+            payment_id_match = _PAYMENT_ID_RE.search(email_body)
             if payment_id_match:
                 payment_info['payment_id'] = payment_id_match.group(1)
             
             # Extract note/description (between payer name and transfer info)
-            note_section = email_body.split('You charged')[1] if 'You charged' in email_body else email_body
-            note_section = note_section.split('Transfer Date')[0] if 'Transfer Date' in note_section else note_section
-            
-            # Clean up the note section
-            lines = [line.strip() for line in note_section.split('\n') if line.strip()]
-            if len(lines) > 1:
-                # Skip the payer name (first line) and get the note
-                payment_info['note'] = ' '.join(lines[1:]).strip()
+            note_match = _NOTE_RE.search(email_body)
+            if note_match:
+                note = ' '.join(line.strip() for line in note_match.group(1).splitlines() if line.strip())
+                if note:
+                    payment_info['note'] = note
             
             logger.info(f"Extracted payment info: ${payment_info.get('amount', 'N/A')} from {payment_info.get('payer_name', 'Unknown')}")
             return payment_info
@@ -136,46 +170,82 @@ class VenmoPaymentDetector:
             logger.error(f"Error extracting payment info: {e}")
             return None
     
-    def find_matching_bills(self, payment_amount: float, payment_date: datetime, tolerance_days: int = 30) -> List[Dict]:
-        """Find bills that match the payment amount and are within the date tolerance"""
+    @staticmethod
+    def _date_from_match(date_match) -> Optional[datetime]:
+        """Build a date from a _DATE_RES match, or None if it is not a real date"""
+        parts = date_match.groupdict()
+        
+        if 'mon' in parts:
+            month = _MONTHS.get(parts['mon'].lower())
+            if month is None:
+                return None
+        else:
+            month = int(parts['month'])
         
         try:
-            # Get all unpaid bills
-            response = self.bills_table.scan(
-                FilterExpression='attribute_not_exists(payment_confirmed) OR payment_confirmed = :false',
-                ExpressionAttributeValues={':false': False}
-            )
+            return datetime(int(parts['year']), month, int(parts['day']))
+        except ValueError:
+            return None
+    
+    def _get_unpaid_bills(self) -> List[Dict]:
+        """Get all unpaid bills, scanning once per detector"""
+        if self._unpaid_bills is not None:
+            return self._unpaid_bills
+        
+        # Matching only needs these; skip email bodies and payment details
+        response = self.bills_table.scan(
+            FilterExpression='attribute_not_exists(payment_confirmed) OR payment_confirmed = :false',
+            ExpressionAttributeValues={':false': False},
+            ProjectionExpression='bill_id, roommate_portion, due_date, due_date_epoch'
+        )
+        
+        self._unpaid_bills = response.get('Items', [])
+        return self._unpaid_bills
+    
+    def find_matching_bills(self, payment_amount: Decimal, payment_date: datetime, tolerance_days: int = 30) -> List[Dict]:
+        """Find bills whose roommate portion equals the payment amount and are within the date tolerance"""
+        
+        try:
+            if UNPAID_BILLS_INDEX:
+                # Only unpaid bills for exactly this amount
+                response = self.bills_table.query(
+                    IndexName=UNPAID_BILLS_INDEX,
+                    KeyConditionExpression=Key('payment_status').eq('unpaid') &
+                        Key('roommate_portion').eq(payment_amount)
+                )
+                bills = response.get('Items', [])
+            else:
+                bills = self._get_unpaid_bills()
             
             matching_bills = []
-            amount_tolerance = 0.01  # $0.01 tolerance for floating point comparison
-            
-            for bill in response.get('Items', []):
-                # Check if roommate portion matches payment amount
-                roommate_portion = float(bill.get('roommate_portion', 0))
-                
-                if abs(roommate_portion - payment_amount) <= amount_tolerance:
-                    # Check if bill is within the date tolerance
-                    bill_date_str = bill.get('due_date', '')
-                    try:
-                        # Parse bill due date (format: M/D/YYYY)
-                        bill_date = datetime.strptime(bill_date_str, '%m/%d/%Y')
-                        
-                        # Check if payment is within tolerance period of bill
-                        days_diff = abs((payment_date - bill_date).days)
-                        
-                        if days_diff <= tolerance_days:
-                            matching_bills.append({
-                                'bill': bill,
-                                'amount_match': abs(roommate_portion - payment_amount),
-                                'days_diff': days_diff
-                            })
-                            
-                    except ValueError:
-                        logger.warning(f"Could not parse bill date: {bill_date_str}")
-                        continue
-            
-            # Sort by best match (closest amount, then closest date)
-            matching_bills.sort(key=lambda x: (x['amount_match'], x['days_diff']))
+            pay_epoch = int(payment_date.timestamp())
+            tolerance_seconds = tolerance_days * SECONDS_PER_DAY
+            
+            for bill in bills:
+                # Check if roommate portion matches payment amount (both Decimal, exact)
+                if bill.get('roommate_portion') == payment_amount:
+                    due_epoch = bill.get('due_date_epoch')
+                    if due_epoch is None:
+                        # Bills saved before due_date_epoch existed: parse once and
+                        # keep the result on the (possibly cached) item
+                        bill_date_str = bill.get('due_date', '')
+                        try:
+                            due_epoch = int(datetime.strptime(bill_date_str, '%m/%d/%Y').timestamp())
+                        except ValueError:
+                            logger.warning(f"Could not parse bill date: {bill_date_str}")
+                            continue
+                        bill['due_date_epoch'] = due_epoch
+                    
+                    # Check if payment is within tolerance period of bill
+                    seconds_diff = abs(pay_epoch - int(due_epoch))
+                    if seconds_diff <= tolerance_seconds:
+                        matching_bills.append({
+                            'bill': bill,
+                            'days_diff': seconds_diff // SECONDS_PER_DAY
+                        })
+            
+            # Sort by best match (closest date)
+            matching_bills.sort(key=lambda x: x['days_diff'])
             
             logger.info(f"Found {len(matching_bills)} matching bills for payment of ${payment_amount}")
             return matching_bills
@@ -184,8 +254,15 @@ class VenmoPaymentDetector:
             logger.error(f"Error finding matching bills: {e}")
             return []
     
-    def mark_bill_as_paid(self, bill_id: str, payment_info: Dict) -> bool:
-        """Mark a bill as paid with payment confirmation details"""
+    def mark_bill_as_paid(self, bill_id: str, payment_info: Dict, log_writer=None) -> bool:
+        """
+        Mark a bill as paid with payment confirmation details
+        
+        Args:
+            bill_id: Bill to update
+            payment_info: Extracted payment details
+            log_writer: Optional log table batch_writer to buffer the log entry
+        """
         
         try:
             # Update bill status
@@ -198,21 +275,26 @@ class VenmoPaymentDetector:
                         payment_id = :payment_id,
                         payer_name = :payer_name,
                         payment_note = :payment_note,
+                        payment_status = :payment_status,
                         status = :status
                 ''',
                 ExpressionAttributeValues={
                     ':confirmed': True,
                     ':payment_date': payment_info['payment_date'].isoformat(),
-                    ':payment_amount': Decimal(str(payment_info['amount'])),
+                    ':payment_amount': payment_info['amount'],
                     ':payment_id': payment_info.get('payment_id', ''),
                     ':payer_name': payment_info.get('payer_name', ''),
                     ':payment_note': payment_info.get('note', ''),
+                    ':payment_status': 'paid',
                     ':status': 'paid'
                 }
             )
             
+            # The cached unpaid list now includes a paid bill
+            self._unpaid_bills = None
+            
             # Log the payment confirmation
-            self.log_table.put_item(
+            (log_writer or self.log_table).put_item(
                 Item={
                     'bill_id': bill_id,
                     'timestamp': datetime.now().isoformat(),
@@ -228,8 +310,8 @@ class VenmoPaymentDetector:
             logger.error(f"Error marking bill as paid: {e}")
             return False
     
-    def process_venmo_payment_email(self, email_data: Dict) -> Dict:
-        """Process a Venmo payment confirmation email"""
+    def process_venmo_payment_email(self, email_data: Dict, log_writer=None) -> Dict:
+        """Process a Venmo payment confirmation email (log_writer is passed to mark_bill_as_paid)"""
         
         result = {
             'success': False,
@@ -239,13 +321,20 @@ class VenmoPaymentDetector:
         }
         
         try:
+            # Cheap reject for Venmo mail with no charge amount (marketing, statements).
+            # Checked on the same window extract_payment_info searches.
+            body = email_data.get('body', '')[:MAX_BODY_CHARS]
+            if '$' not in body or 'you charged' not in body.lower():
+                result['message'] = 'Not a Venmo payment confirmation email'
+                return result
+            
             # Verify this is a Venmo payment email
             if not self.is_venmo_payment_email(email_data):
                 result['message'] = 'Not a Venmo payment confirmation email'
                 return result
             
             # Extract payment information
-            payment_info = self.extract_payment_info(email_data.get('body', ''))
+            payment_info = self.extract_payment_info(body)
             if not payment_info:
                 result['message'] = 'Could not extract payment information'
                 return result
@@ -270,7 +359,7 @@ class VenmoPaymentDetector:
             best_match = matching_bills[0]
             bill_id = best_match['bill']['bill_id']
             
-            if self.mark_bill_as_paid(bill_id, payment_info):
+            if self.mark_bill_as_paid(bill_id, payment_info, log_writer):
                 result['success'] = True
                 result['bills_updated'] = 1
                 result['message'] = f"Bill {bill_id} marked as paid (${payment_info['amount']})"
@@ -331,8 +420,8 @@ def test_payment_extraction():
     print("Test Payment Extraction:")
     print(f"Payment Info: {payment_info}")
     
-    expected_amount = 183.21
-    if payment_info and abs(payment_info['amount'] - expected_amount) < 0.01:
+    expected_amount = Decimal('183.21')
+    if payment_info and payment_info['amount'] == expected_amount:
         print("✅ Amount extraction test passed")
     else:
         print("❌ Amount extraction test failed")
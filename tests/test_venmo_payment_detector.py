@@ -0,0 +1,60 @@
+"""
+Venmo confirmation parsing
+"""
+
+import os
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from venmo_payment_detector import MAX_BODY_CHARS, VenmoPaymentDetector
+
+# extract_payment_info only parses text; skip __init__ and its DynamoDB tables
+detector = VenmoPaymentDetector.__new__(VenmoPaymentDetector)
+
+
+def test_note_after_inline_payer():
+    body = (
+        "You charged Ushi Lo\n"
+        "PG&E bill split - 10/05/2025\n"
+        "$42.17\n"
+        "Transfer Date and Amount:\n"
+        "Oct 07, 2025 $42.17\n"
+    )
+    info = detector.extract_payment_info(body)
+    
+    assert info['payer_name'] == 'Ushi Lo'
+    assert info['note'] == 'PG&E bill split - 10/05/2025 $42.17'
+
+
+def test_payer_on_next_line_is_not_part_of_note():
+    body = (
+        "You charged\n"
+        "Ushi Lo\n"
+        "PG&E bill split - 10/05/2025\n"
+        "$42.17\n"
+        "Transfer Date and Amount:\n"
+        "Oct 07, 2025 $42.17\n"
+    )
+    info = detector.extract_payment_info(body)
+    
+    assert info['payer_name'] == 'Ushi Lo'
+    assert info['note'] == 'PG&E bill split - 10/05/2025 $42.17'
+
+
+def test_no_note_without_lines_after_payer():
+    info = detector.extract_payment_info("You charged Ushi Lo $42.17")
+    
+    assert info['amount'] == Decimal('42.17')
+    assert 'note' not in info
+
+
+def test_keywords_past_body_window_are_ignored():
+    # extract_payment_info never sees text past MAX_BODY_CHARS, so detection must not either
+    email = {
+        'sender': 'Venmo <venmo@venmo.com>',
+        'body': "You charged Ushi Lo $42.17\n" + " " * MAX_BODY_CHARS + "Payment ID: 123",
+    }
+    
+    assert not detector.is_venmo_payment_email(email)
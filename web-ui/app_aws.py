@@ -8,130 +8,424 @@ Flask web application adapted for AWS deployment with DynamoDB backend.
 import os
 import json
 import logging
+import re
+import smtplib
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from decimal import Decimal
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from email.mime.text import MIMEText
+from flask import Flask, render_template, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+from flask_compress import Compress
+from jinja2 import FileSystemBytecodeCache
 import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Venmo link quoting lives with the Lambda code (src/) so SMS and dashboard links match
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from venmo_links import venmo_query, venmo_web_url
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; types orjson can't encode (Decimal) use Flask's default hook"""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+# Falls back to Flask's stdlib json provider when orjson is not installed
+if orjson:
+    app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
+# Compiled templates are cached on disk so new workers skip the Jinja parse;
+# templates are only re-checked for changes in development
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR', '/tmp/pge_jinja_cache')
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory=JINJA_CACHE_DIR)
+app.jinja_env.auto_reload = os.environ.get('FLASK_ENV') == 'development'
+
+# Gzip HTML pages and JSON API responses
+app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json']
+app.config['COMPRESS_LEVEL'] = 6
+Compress(app)
+
+# Rendered bill pages and bill items change only when the Lambda or an SMS send
+# updates bills, and those paths invalidate them. The invalidation has to reach
+# every gunicorn worker, so caching needs a shared backend: RedisCache, used
+# when CACHE_REDIS_URL is set. A per-process cache such as SimpleCache is only
+# used with GUNICORN_WORKERS=1; otherwise nothing is cached (NullCache).
+# The /settings page (Gmail account, phone numbers, Venmo handles) is not
+# cached; the cached bill pages show only the roommate's Venmo handle.
+_SHARED_CACHE_TYPES = ('RedisCache',)
+CACHE_TYPE = os.environ.get('CACHE_TYPE') or (
+    'RedisCache' if os.environ.get('CACHE_REDIS_URL') else 'NullCache'
+)
+if CACHE_TYPE not in _SHARED_CACHE_TYPES + ('NullCache',) and os.environ.get('GUNICORN_WORKERS') != '1':
+    logger.warning(f"CACHE_TYPE={CACHE_TYPE} is not shared between gunicorn workers; caching is off")
+    CACHE_TYPE = 'NullCache'
+
+cache = Cache(app, config={
+    'CACHE_TYPE': CACHE_TYPE,
+    'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL'),
+    'CACHE_DEFAULT_TIMEOUT': 60,
+    # Keys stay in their own namespace, so the app never touches other data in Redis
+    'CACHE_KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', 'pge-web:'),
+    'CACHE_NO_NULL_WARNING': True
+})
+
+# Page and item keys carry the current bills generation. A full invalidation
+# moves to a new random generation instead of flushing the backend; entries of
+# the old one are never read again and expire on their own.
+_BILLS_GENERATION_KEY = 'bills_generation'
+_BILL_LIST_PATHS = ('/', '/bills', '/api/debug-bills')
+
+# HTML pages that answer If-None-Match with 304 when the rendered page is unchanged
+_ETAG_ENDPOINTS = {'dashboard', 'bills', 'bill_detail'}
+
+# Flask-Compress appends the content coding to the ETag ("<hash>:gzip") and
+# browsers send that form back, so it is stripped before comparing
+_ETAG_CODING_RE = re.compile(r':(?:gzip|deflate|br|zstd)"')
+
+@app.after_request
+def _add_cache_headers(response):
+    """Let monitors cache /health briefly and browsers revalidate pages by ETag"""
+    # Registered after Compress, so this runs before it and hashes the uncompressed page
+    if request.endpoint == 'health_check':
+        response.headers['Cache-Control'] = 'public, max-age=60, must-revalidate'
+    elif (request.endpoint in _ETAG_ENDPOINTS and request.method == 'GET'
+          and response.status_code == 200):
+        response.headers['Cache-Control'] = 'no-cache'
+        response.add_etag()
+        
+        environ = request.environ
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            environ = {**environ, 'HTTP_IF_NONE_MATCH': _ETAG_CODING_RE.sub('"', if_none_match)}
+        response.make_conditional(environ)
+    return response
+
 # AWS Configuration
 AWS_REGION = os.environ.get('AWS_REGION', 'us-west-2')
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-lambda_client = boto3.client('lambda', region_name=AWS_REGION)
-secrets_client = boto3.client('secretsmanager', region_name=AWS_REGION)
+
+# One session and HTTP pool config for every client; gunicorn threads share the
+# pools, so they need more than botocore's default of 10 connections
+_boto_session = boto3.session.Session(region_name=AWS_REGION)
+_boto_config = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 10, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+dynamodb = _boto_session.resource('dynamodb', config=_boto_config)
+
+# A synchronous invoke runs the automation for up to LAMBDA_INVOKE_TIMEOUT, so
+# the Lambda client waits that long for a reply and never retries: a retried
+# invoke would run the automation again
+LAMBDA_INVOKE_TIMEOUT = 300  # seconds
+lambda_client = _boto_session.client('lambda', config=_boto_config.merge(Config(
+    read_timeout=LAMBDA_INVOKE_TIMEOUT + 10,
+    retries={'total_max_attempts': 1, 'mode': 'standard'}
+)))
+secrets_client = _boto_session.client('secretsmanager', config=_boto_config)
 
 # Environment variables
 BILLS_TABLE = os.environ.get('BILLS_TABLE', 'pge-bill-automation-bills-dev')
 LAMBDA_FUNCTION = os.environ.get('LAMBDA_FUNCTION', 'pge-bill-automation-automation-dev')
 SECRETS_ARN = os.environ.get('SECRETS_ARN')
 
+# Job rows (PK job_id) for async Lambda runs started from the dashboard; the
+# Lambda updates them as it goes. Without a table the invoke stays synchronous.
+JOBS_TABLE = os.environ.get('JOBS_TABLE')
+JOB_ROW_TTL = 7 * 24 * 60 * 60  # seconds, for the table's expires_at TTL attribute
+jobs_table = dynamodb.Table(JOBS_TABLE) if JOBS_TABLE else None
+
+# Synchronous invokes (no JOBS_TABLE) run on a bounded pool so bursts of clicks
+# cannot tie up every request thread or exhaust the botocore connection pool
+LAMBDA_INVOKE_WORKERS = 8
+_lambda_pool = ThreadPoolExecutor(max_workers=LAMBDA_INVOKE_WORKERS, thread_name_prefix='lambda-invoke')
+_inflight_invokes = {}
+_inflight_lock = threading.Lock()
+
+_JOB_MESSAGES = {
+    'queued': 'Automation queued',
+    'running': 'Automation running',
+    'succeeded': 'Automation completed successfully',
+    'failed': 'Automation failed'
+}
+
+# Bills-table row with running totals the Lambda keeps for the dashboard
+SUMMARY_BILL_ID = '__SUMMARY__'
+
+# GSI on the bills table (PK gsi1_pk, SK due_date_iso, projection ALL), e.g.
+# 'BillsByDueDate'. Bills are scanned and sorted in Python when it is not configured.
+BILLS_BY_DUE_DATE_INDEX = os.environ.get('BILLS_BY_DUE_DATE_INDEX')
+
+# Parallel Scan: with ENABLE_PARALLEL_SCAN=true, list scans read this many
+# disjoint segments concurrently (worth it once the table spans several MB)
+PARALLEL_SCAN_SEGMENTS = (
+    int(os.environ.get('PARALLEL_SCAN_SEGMENTS', 4))
+    if os.environ.get('ENABLE_PARALLEL_SCAN', 'false').lower() == 'true' else 0
+)
+_scan_pool = (
+    ThreadPoolExecutor(max_workers=PARALLEL_SCAN_SEGMENTS, thread_name_prefix='bill-scan')
+    if PARALLEL_SCAN_SEGMENTS > 1 else None
+)
+
+# Recent /test-connection results, keyed by component ('all' for the full check)
+CONNECTION_TEST_TTL = 30  # seconds
+_CONNECTION_TEST_CACHE = {}
+
+# Gmail SMTP for email-to-SMS; each gunicorn thread keeps its session open
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 587
+SMTP_TIMEOUT = 10  # seconds
+_smtp_local = threading.local()
+
+# Settings from Secrets Manager, shared by every request in this worker
+SETTINGS_CACHE_TTL = int(os.environ.get('SETTINGS_CACHE_TTL', 300))  # seconds
+_SETTINGS_CACHE = {'ts': 0, 'settings': None}
+
+# Bill detail items are cached (shared cache above) so repeat views and the
+# Venmo/SMS actions on the same bill skip GetItem; writes from this app evict them
+BILL_CACHE_TTL = int(os.environ.get('BILL_CACHE_TTL', 30))  # seconds
+
+# Bills store due_date as MM/DD/YYYY
+_BILL_DATE_FMT = '%m/%d/%Y'
+
+# Numeric attributes (Decimal in DynamoDB) that the templates format as floats
+_NUM_FIELDS = ('amount', 'roommate_portion', 'my_portion')
+
+# Other attributes shown in bill lists, with their defaults
+_LIST_FIELDS = {
+    'due_date': '',
+    'due_date_iso': '',
+    'processed_date': '',
+    'status': 'processed',
+    'sms_sent': False,
+    'sms_sent_at': '',
+    'venmo_sent': False,
+    'payment_confirmed': False
+}
+
+# List reads fetch only these attributes, so large fields like email_body
+# are never transferred ('status' is a DynamoDB reserved word)
+_LIST_PROJECTION = ', '.join(
+    '#s' if name == 'status' else name
+    for name in ('bill_id', *_NUM_FIELDS, *_LIST_FIELDS)
+)
+_LIST_PROJECTION_NAMES = {'#s': 'status'}
+
+# The dashboard's latest-bills table needs even less (due_date_iso keeps the order).
+# Projections passed to get_all_bills must alias status as #s; fields left out
+# get their _LIST_FIELDS defaults.
+_DASHBOARD_PROJECTION = ', '.join(
+    '#s' if name == 'status' else name
+    for name in ('bill_id', 'amount', 'roommate_portion', 'due_date', 'due_date_iso',
+                 'status', 'sms_sent', 'payment_confirmed')
+)
+
+# The bill detail page also shows the source email
+_DETAIL_FIELDS = {
+    **_LIST_FIELDS,
+    'email_id': '',
+    'email_subject': '',
+    'email_date': '',
+    'notes': ''
+}
+
+def _format_bill(bill, detail=False):
+    """Convert a raw DynamoDB item to the dict the templates and API use"""
+    formatted = {'id': bill.get('bill_id', '')}
+    for name in _NUM_FIELDS:
+        value = bill.get(name)
+        formatted[name] = float(value) if value is not None else 0.0
+    
+    for name, default in (_DETAIL_FIELDS if detail else _LIST_FIELDS).items():
+        formatted[name] = bill.get(name, default)
+    
+    return formatted
+
+def _due_date_sort_key(bill):
+    """ISO due date for sorting; only rows saved before due_date_iso existed are parsed"""
+    if bill['due_date_iso']:
+        return bill['due_date_iso']
+    try:
+        return datetime.strptime(bill['due_date'], _BILL_DATE_FMT).strftime('%Y-%m-%d')
+    except ValueError:
+        # Unparseable dates sort last
+        return ''
+
 class AWSBillDatabase:
     """DynamoDB interface for bill management"""
     
     def __init__(self):
         self.table = dynamodb.Table(BILLS_TABLE)
     
-    def get_all_bills(self):
-        """Get all bills from DynamoDB"""
+    def get_all_bills(self, limit=None, projection=_LIST_PROJECTION):
+        """Get bills from DynamoDB, newest due date first (only the first `limit` if given)"""
         try:
-            response = self.table.scan()
-            bills = response.get('Items', [])
-            
-            # Convert to expected format and sort by date
-            formatted_bills = []
-            for bill in bills:
-                # Handle Decimal conversion properly
-                amount = bill.get('amount', 0)
-                roommate_portion = bill.get('roommate_portion', 0)  
-                my_portion = bill.get('my_portion', 0)
-                
-                # Convert Decimal to float if needed
-                if isinstance(amount, Decimal):
-                    amount = float(amount)
-                if isinstance(roommate_portion, Decimal):
-                    roommate_portion = float(roommate_portion)
-                if isinstance(my_portion, Decimal):
-                    my_portion = float(my_portion)
-                
-                formatted_bills.append({
-                    'id': bill.get('bill_id', ''),
-                    'amount': amount,
-                    'due_date': bill.get('due_date', ''),
-                    'roommate_portion': roommate_portion,
-                    'my_portion': my_portion,
-                    'processed_date': bill.get('processed_date', ''),
-                    'status': bill.get('status', 'processed'),
-                    'sms_sent': bill.get('sms_sent', False),
-                    'sms_sent_at': bill.get('sms_sent_at', ''),
-                    'venmo_sent': bill.get('venmo_sent', False),
-                    'payment_confirmed': bill.get('payment_confirmed', False)
-                })
-            
-            # Sort by due date (newest first)
-            try:
-                formatted_bills.sort(key=lambda x: datetime.strptime(x['due_date'], '%m/%d/%Y'), reverse=True)
-            except ValueError:
-                # If date parsing fails, just return unsorted
-                pass
+            if BILLS_BY_DUE_DATE_INDEX:
+                bills = self._query_bills_by_due_date(limit, projection)
+            else:
+                bills = self.scan_items(
+                    ProjectionExpression=projection,
+                    ExpressionAttributeNames=_LIST_PROJECTION_NAMES
+                )
             
-            return formatted_bills
+            return self.format_bills(bills, limit=limit, presorted=bool(BILLS_BY_DUE_DATE_INDEX))
             
         except ClientError as e:
             logger.error(f"Error fetching bills: {e}")
             return []
     
+    def scan_items(self, **scan_kwargs):
+        """Yield raw items from every Scan page (a single Scan call stops at 1 MB)"""
+        if _scan_pool is None:
+            yield from self._scan_pages(**scan_kwargs)
+            return
+        
+        # Each worker pages through its own segment; items come back segment by segment
+        segments = _scan_pool.map(
+            lambda segment: list(self._scan_pages(
+                Segment=segment,
+                TotalSegments=PARALLEL_SCAN_SEGMENTS,
+                **scan_kwargs
+            )),
+            range(PARALLEL_SCAN_SEGMENTS)
+        )
+        for items in segments:
+            yield from items
+    
+    def _scan_pages(self, **scan_kwargs):
+        """Yield items from each page of one (possibly segmented) Scan"""
+        paginator = self.table.meta.client.get_paginator('scan')
+        for page in paginator.paginate(TableName=BILLS_TABLE, **scan_kwargs):
+            yield from page.get('Items', [])
+    
+    def format_bills(self, bills, limit=None, presorted=False):
+        """Convert raw DynamoDB items to list rows, newest due date first"""
+        # Convert to expected format and sort by date
+        formatted_bills = [_format_bill(bill) for bill in bills if bill.get('bill_id') != SUMMARY_BILL_ID]
+        
+        # Sort by due date (newest first) unless the items are already in order
+        if not presorted:
+            formatted_bills.sort(key=_due_date_sort_key, reverse=True)
+            
+            if limit:
+                formatted_bills = formatted_bills[:limit]
+        
+        return formatted_bills
+    
+    def get_summary(self):
+        """Dashboard totals from the summary row, or None if it has not been created yet"""
+        try:
+            item = self.table.get_item(Key={'bill_id': SUMMARY_BILL_ID}).get('Item')
+            if not item:
+                return None
+            
+            total_bills = int(item.get('total_bills', 0))
+            total_amount = float(item.get('total_amount', 0))
+            return {
+                'total_bills': total_bills,
+                'total_amount': total_amount,
+                'total_roommate_portion': float(item.get('total_roommate_portion', 0)),
+                'pending_bills': 0,  # For now, no pending logic
+                'sms_sent': int(item.get('sms_sent', 0)),
+                'average_bill': total_amount / total_bills if total_bills > 0 else 0
+            }
+            
+        except ClientError as e:
+            logger.error(f"Error fetching bill summary: {e}")
+            return None
+    
+    def count_sms_sent(self):
+        """Count one more notified bill in the summary row, if it exists"""
+        try:
+            self.table.update_item(
+                Key={'bill_id': SUMMARY_BILL_ID},
+                UpdateExpression='ADD sms_sent :one',
+                # Only backfill_bills.py creates the row, so it never holds partial totals
+                ConditionExpression='attribute_exists(bill_id)',
+                ExpressionAttributeValues={':one': 1}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    
+    def _query_bills_by_due_date(self, limit=None, projection=_LIST_PROJECTION):
+        """Query the due-date GSI newest first, paging until `limit` bills (or all of them) are read"""
+        query_kwargs = {
+            'IndexName': BILLS_BY_DUE_DATE_INDEX,
+            'KeyConditionExpression': Key('gsi1_pk').eq('BILL'),
+            'ScanIndexForward': False,
+            'ProjectionExpression': projection,
+            'ExpressionAttributeNames': _LIST_PROJECTION_NAMES
+        }
+        if limit:
+            query_kwargs['Limit'] = limit
+        
+        response = self.table.query(**query_kwargs)
+        items = response.get('Items', [])
+        
+        # A page can come back short of Limit when it hits the 1 MB cap
+        while 'LastEvaluatedKey' in response and (not limit or len(items) < limit):
+            if limit:
+                query_kwargs['Limit'] = limit - len(items)
+            response = self.table.query(ExclusiveStartKey=response['LastEvaluatedKey'], **query_kwargs)
+            items.extend(response.get('Items', []))
+        
+        return items
+    
     def get_bill_by_id(self, bill_id):
-        """Get specific bill by ID"""
+        """Get specific bill by ID (cached for BILL_CACHE_TTL seconds)"""
+        cached = self._cached_bill(bill_id)
+        if cached:
+            return cached
+        
         try:
             response = self.table.get_item(Key={'bill_id': bill_id})
             if 'Item' in response:
-                bill = response['Item']
-                
-                # Handle Decimal conversion properly
-                amount = bill.get('amount', 0)
-                roommate_portion = bill.get('roommate_portion', 0)  
-                my_portion = bill.get('my_portion', 0)
-                
-                # Convert Decimal to float if needed
-                if isinstance(amount, Decimal):
-                    amount = float(amount)
-                if isinstance(roommate_portion, Decimal):
-                    roommate_portion = float(roommate_portion)
-                if isinstance(my_portion, Decimal):
-                    my_portion = float(my_portion)
-                
-                return {
-                    'id': bill.get('bill_id', ''),
-                    'amount': amount,
-                    'due_date': bill.get('due_date', ''),
-                    'roommate_portion': roommate_portion,
-                    'my_portion': my_portion,
-                    'processed_date': bill.get('processed_date', ''),
-                    'status': bill.get('status', 'processed'),
-                    'sms_sent': bill.get('sms_sent', False),
-                    'sms_sent_at': bill.get('sms_sent_at', ''),
-                    'venmo_sent': bill.get('venmo_sent', False),
-                    'payment_confirmed': bill.get('payment_confirmed', False),
-                    'email_id': bill.get('email_id', ''),
-                    'email_subject': bill.get('email_subject', ''),
-                    'email_date': bill.get('email_date', ''),
-                    'notes': bill.get('notes', '')
-                }
+                bill = _format_bill(response['Item'], detail=True)
+                self._cache_bill(bill_id, bill)
+                return bill
             return None
             
         except ClientError as e:
             logger.error(f"Error fetching bill {bill_id}: {e}")
             return None
+    
+    def _cached_bill(self, bill_id):
+        """A formatted bill from the cache, or None"""
+        return cache.get(_bill_item_key(bill_id))
+    
+    def _cache_bill(self, bill_id, bill):
+        """Cache a formatted bill for BILL_CACHE_TTL seconds"""
+        cache.set(_bill_item_key(bill_id), bill, timeout=BILL_CACHE_TTL)
 
 def load_settings():
-    """Load settings from AWS Secrets Manager"""
+    """Load settings from AWS Secrets Manager (cached for SETTINGS_CACHE_TTL seconds)"""
     try:
         if not SECRETS_ARN:
             # Default settings with your actual info for development
@@ -145,8 +439,13 @@ def load_settings():
                 'my_email': 'andrewhting@gmail.com'
             }
             
+        if _SETTINGS_CACHE['settings'] is not None and time.monotonic() - _SETTINGS_CACHE['ts'] < SETTINGS_CACHE_TTL:
+            return _SETTINGS_CACHE['settings']
+        
         response = secrets_client.get_secret_value(SecretId=SECRETS_ARN)
-        return json.loads(response['SecretString'])
+        _SETTINGS_CACHE['settings'] = json.loads(response['SecretString'])
+        _SETTINGS_CACHE['ts'] = time.monotonic()
+        return _SETTINGS_CACHE['settings']
         
     except Exception as e:
         logger.error(f"Error loading settings: {e}")
@@ -159,31 +458,181 @@ def load_settings():
 # Initialize database
 db = AWSBillDatabase()
 
+def _smtp_connection(user, password):
+    """This thread's logged-in SMTP session, reconnecting only if it has dropped"""
+    server = getattr(_smtp_local, 'server', None)
+    if server is not None:
+        try:
+            if _smtp_local.user == user and server.noop()[0] == 250:
+                return server
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            # Gmail closes idle sessions; fall through and reconnect
+            pass
+        _smtp_local.server = None
+    
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    server.starttls()
+    server.login(user, password)
+    
+    _smtp_local.server = server
+    _smtp_local.user = user
+    return server
+
+def _send_email(user, password, msg):
+    """Send on this thread's SMTP session, retrying once on a new one if it drops mid-send"""
+    try:
+        _smtp_connection(user, password).send_message(msg)
+    except smtplib.SMTPServerDisconnected:
+        logger.info("SMTP session dropped during send; reconnecting")
+        _smtp_local.server = None
+        _smtp_connection(user, password).send_message(msg)
+
+def _invoke_and_read(payload):
+    """Invoke the Lambda synchronously and return (status code, parsed payload)"""
+    response = lambda_client.invoke(
+        FunctionName=LAMBDA_FUNCTION,
+        InvocationType='RequestResponse',
+        Payload=json.dumps(payload)
+    )
+    return response['StatusCode'], app.json.loads(response['Payload'].read())
+
+def _invoke_automation(payload):
+    """Run the Lambda on the invoke pool, joining an identical run that is already in flight"""
+    key = json.dumps(payload, sort_keys=True)
+    
+    with _inflight_lock:
+        future = _inflight_invokes.get(key)
+        started = future is None
+        if started:
+            future = _lambda_pool.submit(_invoke_and_read, payload)
+            _inflight_invokes[key] = future
+    
+    if started:
+        def _forget(done):
+            with _inflight_lock:
+                if _inflight_invokes.get(key) is done:
+                    del _inflight_invokes[key]
+        future.add_done_callback(_forget)
+    
+    return future.result(timeout=LAMBDA_INVOKE_TIMEOUT)
+
+def _venmo_urls(settings, bill):
+    """Venmo links for charging the roommate's share of a bill
+    
+    Returns:
+        Dict with the app deep link ('app'), the same link without a note for
+        SMS ('app_short') and the venmo.com fallback ('web')
+    """
+    recipient = settings.get('roommate_venmo', 'UshiLo')
+    charge = {'txn': 'charge', 'recipients': recipient, 'amount': f"{bill['roommate_portion']:.2f}"}
+    
+    short_query = venmo_query(charge)
+    note_query = venmo_query({'note': f"PG&E bill split - {bill['due_date']}"})
+    
+    return {
+        'app': f"venmo://paycharge?{short_query}&{note_query}",
+        'app_short': f"venmo://paycharge?{short_query}",
+        'web': venmo_web_url(recipient, {'txn': 'pay', 'amount': charge['amount'], 'note': 'PG&E bill split'})
+    }
+
+def _start_automation_job(payload):
+    """Record a queued job and invoke the Lambda asynchronously; returns the job id"""
+    job_id = uuid.uuid4().hex
+    now = datetime.now()
+    jobs_table.put_item(Item={
+        'job_id': job_id,
+        'status': 'queued',
+        'created_at': now.isoformat(),
+        'updated_at': now.isoformat(),
+        'expires_at': int(now.timestamp()) + JOB_ROW_TTL
+    })
+    
+    lambda_client.invoke(
+        FunctionName=LAMBDA_FUNCTION,
+        InvocationType='Event',
+        Payload=json.dumps({**payload, 'job_id': job_id})
+    )
+    return job_id
+
+def _bills_generation():
+    """Current bills generation (see _BILLS_GENERATION_KEY), read once per request"""
+    if 'bills_generation' not in g:
+        generation = cache.get(_BILLS_GENERATION_KEY)
+        if generation is None:
+            # First use or evicted: start a new generation (add keeps a concurrent one)
+            cache.add(_BILLS_GENERATION_KEY, uuid.uuid4().hex, timeout=0)
+            generation = cache.get(_BILLS_GENERATION_KEY)
+        g.bills_generation = generation
+    return g.bills_generation
+
+def _view_key(path=None):
+    """Cache key for a bill list page (the current request's path by default)"""
+    return f'view:{_bills_generation()}:{path or request.path}'
+
+def _bill_page_key(bill_id):
+    """Cache key for one bill's detail page"""
+    return f'bill:{_bills_generation()}:{bill_id}'
+
+def _bill_item_key(bill_id):
+    """Cache key for one formatted bill item"""
+    return f'bill_item:{_bills_generation()}:{bill_id}'
+
+def _invalidate_bill_views(bill_id=None):
+    """Drop cached pages and bill items after bills change (all bills unless bill_id is given)"""
+    if bill_id is None:
+        # A Lambda run can touch any bill, so every cached page and item goes
+        cache.set(_BILLS_GENERATION_KEY, uuid.uuid4().hex, timeout=0)
+        g.pop('bills_generation', None)
+    else:
+        cache.delete_many(*(_view_key(path) for path in _BILL_LIST_PATHS),
+                          _bill_page_key(bill_id), _bill_item_key(bill_id))
+
+def _get_bill(bill_id):
+    """get_bill_by_id, memoized for the current request"""
+    bills = g.setdefault('bills', {})
+    if bill_id not in bills:
+        bills[bill_id] = db.get_bill_by_id(bill_id)
+    return bills[bill_id]
+
+def _settings():
+    """load_settings, memoized for the current request"""
+    if 'settings' not in g:
+        g.settings = load_settings()
+    return g.settings
+
 @app.route('/')
+@cache.cached(key_prefix=_view_key)
 def dashboard():
     """Main dashboard"""
     try:
         logger.info("Loading dashboard...")
-        bills = db.get_all_bills()
+        
+        # Totals come from the summary row, so only the latest 5 bills are read
+        summary = db.get_summary()
+        if summary is not None:
+            bills = db.get_all_bills(limit=5, projection=_DASHBOARD_PROJECTION)
+        else:
+            # No summary row yet (run backfill_bills.py): aggregate every bill
+            bills = db.get_all_bills(projection=_DASHBOARD_PROJECTION)
+            
+            total_bills = len(bills) if bills else 0
+            total_amount = sum(bill['amount'] for bill in bills) if bills else 0
+            total_roommate_portion = sum(bill['roommate_portion'] for bill in bills) if bills else 0
+            
+            summary = {
+                'total_bills': total_bills,
+                'total_amount': total_amount,
+                'total_roommate_portion': total_roommate_portion,
+                'pending_bills': 0,  # For now, no pending logic
+                'sms_sent': sum(1 for bill in bills if bill.get('sms_sent', False)) if bills else 0,
+                'average_bill': total_amount / total_bills if total_bills > 0 else 0
+            }
         logger.info(f"Found {len(bills) if bills else 0} bills")
         
-        settings = load_settings()
+        settings = _settings()
         logger.info("Settings loaded")
         
-        # Calculate summary statistics
-        total_bills = len(bills) if bills else 0
-        total_amount = sum(bill['amount'] for bill in bills) if bills else 0
-        total_roommate_portion = sum(bill['roommate_portion'] for bill in bills) if bills else 0
-        
-        summary = {
-            'total_bills': total_bills,
-            'total_amount': total_amount,
-            'total_roommate_portion': total_roommate_portion,
-            'pending_bills': 0,  # For now, no pending logic
-            'sms_sent': sum(1 for bill in bills if bill.get('sms_sent', False)) if bills else 0,
-            'average_bill': total_amount / total_bills if total_bills > 0 else 0
-        }
-        
         logger.info("Rendering dashboard template...")
         return render_template('dashboard.html', 
                              bills=bills[:5] if bills else [],  # Show latest 5 bills
@@ -205,20 +654,22 @@ def dashboard():
                              settings={})
 
 @app.route('/bills')
+@cache.cached(key_prefix=_view_key)
 def bills():
     """Bills management page"""
     all_bills = db.get_all_bills()
-    settings = load_settings()
+    settings = _settings()
     
     return render_template('bills.html', 
                          bills=all_bills,
                          settings=settings)
 
 @app.route('/bill/<bill_id>')
+@cache.cached(timeout=120, key_prefix=lambda: _bill_page_key(request.view_args['bill_id']))
 def bill_detail(bill_id):
     """Bill detail page"""
-    bill = db.get_bill_by_id(bill_id)
-    settings = load_settings()
+    bill = _get_bill(bill_id)
+    settings = _settings()
     
     if not bill:
         return render_template('error.html', 
@@ -238,14 +689,14 @@ def bill_detail(bill_id):
 def generate_venmo_route(bill_id):
     """Generate Venmo request for bill"""
     try:
-        bill = db.get_bill_by_id(bill_id)
+        bill = _get_bill(bill_id)
         if not bill:
             return jsonify({'success': False, 'message': 'Bill not found'}), 404
         
-        settings = load_settings()
+        settings = _settings()
         
-        # Generate Venmo URL
-        venmo_url = f"venmo://paycharge?txn=charge&recipients={settings.get('roommate_venmo', 'UshiLo')}&amount={bill['roommate_portion']:.2f}&note=PG%26E%20bill%20split%20-%20{bill['due_date']}"
+        # Generate Venmo URLs
+        venmo_urls = _venmo_urls(settings, bill)
         
         return jsonify({
             'success': True,
@@ -254,8 +705,8 @@ def generate_venmo_route(bill_id):
                 'roommate_owes': f"{bill['roommate_portion']:.2f}",
                 'payment_note': f"PG&E bill split - {bill['due_date']}"
             },
-            'venmo_url': venmo_url,
-            'web_url': f"https://venmo.com/{settings.get('roommate_venmo', 'UshiLo')}?txn=pay&amount={bill['roommate_portion']:.2f}&note=PG%26E%20bill%20split"
+            'venmo_url': venmo_urls['app'],
+            'web_url': venmo_urls['web']
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -273,17 +724,21 @@ def process_bills():
             'manual_trigger': True
         }
         
-        response = lambda_client.invoke(
-            FunctionName=LAMBDA_FUNCTION,
-            InvocationType='RequestResponse',
-            Payload=json.dumps(payload)
-        )
+        if jobs_table:
+            # Return immediately; the dashboard polls /api/job-status/<job_id>
+            job_id = _start_automation_job(payload)
+            return jsonify({
+                'success': True,
+                'message': 'Bill processing started',
+                'job_id': job_id
+            }), 202
         
-        # Parse response
-        result = json.loads(response['Payload'].read())
+        # Synchronous fallback; duplicate clicks share the run already in flight
+        status_code, result = _invoke_automation(payload)
         
-        if response['StatusCode'] == 200:
-            body = json.loads(result.get('body', '{}'))
+        if status_code == 200:
+            _invalidate_bill_views()
+            body = app.json.loads(result.get('body', '{}'))
             return jsonify({
                 'success': True,
                 'message': 'Bills processed successfully',
@@ -316,17 +771,21 @@ def check_payments():
             'payment_check_only': True
         }
         
-        response = lambda_client.invoke(
-            FunctionName=LAMBDA_FUNCTION,
-            InvocationType='RequestResponse',
-            Payload=json.dumps(payload)
-        )
+        if jobs_table:
+            # Return immediately; the dashboard polls /api/job-status/<job_id>
+            job_id = _start_automation_job(payload)
+            return jsonify({
+                'success': True,
+                'message': 'Payment check started',
+                'job_id': job_id
+            }), 202
         
-        # Parse response
-        result = json.loads(response['Payload'].read())
+        # Synchronous fallback; duplicate clicks share the run already in flight
+        status_code, result = _invoke_automation(payload)
         
-        if response['StatusCode'] == 200:
-            body = json.loads(result.get('body', '{}'))
+        if status_code == 200:
+            _invalidate_bill_views()
+            body = app.json.loads(result.get('body', '{}'))
             return jsonify({
                 'success': True,
                 'message': 'Bills processed successfully',
@@ -345,6 +804,54 @@ def check_payments():
             'error': str(e)
         }), 500
 
+def _invalidate_after_job(job_id):
+    """Invalidate bill views once per finished job, however often its status is polled"""
+    try:
+        jobs_table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression='SET views_invalidated = :true',
+            ConditionExpression='attribute_not_exists(views_invalidated)',
+            ExpressionAttributeValues={':true': True}
+        )
+    except ClientError as e:
+        # Another poll already claimed this job's invalidation
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return
+        raise
+    
+    _invalidate_bill_views()
+
+@app.route('/api/job-status/<job_id>')
+def job_status(job_id):
+    """Status and result of an async run started by /api/process-bills or /api/check-payments"""
+    try:
+        if not jobs_table:
+            return jsonify({'success': False, 'error': 'Async jobs are not configured'}), 404
+        
+        # Strongly consistent, so a poll right after the job row is written finds it
+        job = jobs_table.get_item(Key={'job_id': job_id}, ConsistentRead=True).get('Item')
+        if not job:
+            return jsonify({'success': False, 'status': 'not_found', 'message': 'Job not found'}), 404
+        
+        status = job.get('status', 'queued')
+        if status == 'succeeded' and not job.get('views_invalidated'):
+            _invalidate_after_job(job_id)
+        
+        return jsonify({
+            'success': status == 'succeeded',
+            'status': status,
+            'message': job.get('error') or _JOB_MESSAGES.get(status, status),
+            'result': app.json.loads(job['result']) if 'result' in job else {},
+            'updated_at': job.get('updated_at')
+        })
+        
+    except Exception as e:
+        logger.error(f"Error reading job {job_id}: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/create-venmo-request', methods=['POST'])
 def create_venmo_request():
     """Create Venmo payment request"""
@@ -355,14 +862,15 @@ def create_venmo_request():
         if not bill_id:
             return jsonify({'success': False, 'error': 'Bill ID required'}), 400
         
-        bill = db.get_bill_by_id(bill_id)
+        bill = _get_bill(bill_id)
         if not bill:
             return jsonify({'success': False, 'error': 'Bill not found'}), 404
         
-        settings = load_settings()
+        settings = _settings()
         
-        # Generate Venmo URL
-        venmo_url = f"venmo://paycharge?txn=charge&recipients={settings.get('roommate_venmo', 'UshiLo')}&amount={bill['roommate_portion']:.2f}&note=PG%26E%20bill%20split%20-%20{bill['due_date']}"
+        # Generate Venmo URLs
+        venmo_urls = _venmo_urls(settings, bill)
+        venmo_url = venmo_urls['app']
         
         # In test mode, just return the URL
         if settings.get('test_mode', True):
@@ -375,9 +883,6 @@ def create_venmo_request():
         
         # Send SMS via email-to-SMS gateway
         try:
-            import smtplib
-            from email.mime.text import MIMEText
-            
             # Get SMS credentials from settings
             gmail_user = settings.get('gmail_user', 'andrewhting@gmail.com')
             gmail_app_password = settings.get('gmail_app_password')
@@ -387,9 +892,9 @@ def create_venmo_request():
                 raise Exception("Gmail app password not configured in settings")
             
             # Simplify the Venmo URL for better SMS compatibility
-            simple_venmo_url = f"venmo://paycharge?txn=charge&recipients={settings.get('roommate_venmo', 'UshiLo')}&amount={bill['roommate_portion']:.2f}"
+            simple_venmo_url = venmo_urls['app_short']
             
-            bill_month = datetime.strptime(bill['due_date'], '%m/%d/%Y').strftime('%B %Y')
+            bill_month = datetime.strptime(bill['due_date'], _BILL_DATE_FMT).strftime('%B %Y')
             message_body = f"💰 PG&E Bill - {bill_month}\nAmount: ${bill['roommate_portion']:.2f}\n{simple_venmo_url}"
             
             # Create and send email-to-SMS
@@ -398,29 +903,32 @@ def create_venmo_request():
             msg['To'] = sms_gateway
             msg['Subject'] = ''  # Empty subject for SMS
             
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(gmail_user, gmail_app_password)
-            server.send_message(msg)
-            server.quit()
+            _send_email(gmail_user, gmail_app_password, msg)
             
             logger.info(f"SMS sent successfully via {sms_gateway}")
             
             # Mark bill as having SMS sent with timestamp
             try:
                 current_time = datetime.now().isoformat()
-                db.table.update_item(
+                response = db.table.update_item(
                     Key={'bill_id': bill_id},
                     UpdateExpression='SET sms_sent = :val, venmo_sent = :val, sms_sent_at = :sent_at, updated_at = :updated',
                     ExpressionAttributeValues={
                         ':val': True,
                         ':sent_at': current_time,
                         ':updated': current_time
-                    }
+                    },
+                    ReturnValues='UPDATED_OLD'
                 )
+                
+                # Count each bill once in the dashboard summary, not every resend
+                if not response.get('Attributes', {}).get('sms_sent'):
+                    db.count_sms_sent()
             except Exception as e:
                 logger.warning(f"Could not update bill status: {e}")
             
+            _invalidate_bill_views(bill_id)
+            
             return jsonify({
                 'success': True,
                 'message': 'Venmo request created and SMS sent!',
@@ -450,17 +958,49 @@ def create_venmo_request():
         }), 500
 
 
+def _probe_dynamodb():
+    """Test DynamoDB (a fresh Table so DescribeTable really runs)"""
+    try:
+        dynamodb.Table(BILLS_TABLE).table_status
+        return {'dynamodb': 'Connected'}
+    except Exception as e:
+        return {'dynamodb': f'Error: {str(e)}'}
+
+def _probe_lambda():
+    """Test Lambda"""
+    try:
+        lambda_client.get_function(FunctionName=LAMBDA_FUNCTION)
+        return {'lambda': 'Connected'}
+    except Exception as e:
+        return {'lambda': f'Error: {str(e)}'}
+
+def _probe_settings():
+    """Test settings (load_settings, since flask.g is not available on pool threads)"""
+    try:
+        settings = load_settings()
+        return {'settings': 'Loaded', 'test_mode': settings.get('test_mode', 'Unknown')}
+    except Exception as e:
+        return {'settings': f'Error: {str(e)}'}
+
+_CONNECTION_PROBES = (_probe_dynamodb, _probe_lambda, _probe_settings)
+_probe_pool = ThreadPoolExecutor(max_workers=len(_CONNECTION_PROBES), thread_name_prefix='connection-probe')
+
 @app.route('/settings')
 def settings():
     """Settings page"""
-    settings = load_settings()
+    settings = _settings()
     schedule_status = {'loaded': True, 'next_run': 'February 5, 2025 at 2:00 AM PT'}
     return render_template('settings.html', settings=settings, schedule_status=schedule_status)
 
 @app.route('/api/test-connections', methods=['GET'])
 @app.route('/test-connection/<component>')
 def test_connections(component=None):
-    """Test all connections or specific component"""
+    """Test all connections or specific component (?force=1 skips the cache)"""
+    cache_key = component or 'all'
+    cached = _CONNECTION_TEST_CACHE.get(cache_key)
+    if cached and request.args.get('force') != '1' and time.monotonic() - cached[0] < CONNECTION_TEST_TTL:
+        return jsonify(cached[1])
+    
     results = {}
     
     if component:
@@ -481,7 +1021,7 @@ def test_connections(component=None):
             
                 
         elif component == 'venmo':
-            settings = load_settings()
+            settings = _settings()
             roommate_venmo = settings.get('roommate_venmo')
             my_venmo = settings.get('my_venmo')
             if roommate_venmo and my_venmo:
@@ -495,44 +1035,25 @@ def test_connections(component=None):
             results['status'] = 'error'
             results['message'] = f'Unknown component: {component}'
     else:
-        # Test all connections
-        try:
-            # Test DynamoDB
-            table = dynamodb.Table(BILLS_TABLE)
-            table.table_status
-            results['dynamodb'] = 'Connected'
-        except Exception as e:
-            results['dynamodb'] = f'Error: {str(e)}'
-        
-        try:
-            # Test Lambda
-            lambda_client.get_function(FunctionName=LAMBDA_FUNCTION)
-            results['lambda'] = 'Connected'
-        except Exception as e:
-            results['lambda'] = f'Error: {str(e)}'
-        
-        try:
-            # Test settings
-            settings = load_settings()
-            results['settings'] = 'Loaded'
-            results['test_mode'] = settings.get('test_mode', 'Unknown')
-        except Exception as e:
-            results['settings'] = f'Error: {str(e)}'
+        # Test all connections; the probes are independent, so run them side by side
+        for probe_results in _probe_pool.map(lambda probe: probe(), _CONNECTION_PROBES):
+            results.update(probe_results)
     
+    _CONNECTION_TEST_CACHE[cache_key] = (time.monotonic(), results)
     return jsonify(results)
 
 @app.route('/api/debug-bills')
+@cache.cached(key_prefix=_view_key)
 def debug_bills():
     """Debug endpoint to see raw DynamoDB data"""
     try:
-        response = db.table.scan()
-        items = response.get('Items', [])
+        items = list(db.scan_items())
         
-        # Return raw data for debugging
+        # Return raw data for debugging (processed from the same scan)
         debug_info = {
             'raw_items_count': len(items),
             'raw_items': items,
-            'processed_bills': db.get_all_bills()
+            'processed_bills': db.format_bills(items)
         }
         
         return jsonify(debug_info)
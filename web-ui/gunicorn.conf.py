@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for the AWS web interface
+
+Used by App Runner (apprunner.yaml): gunicorn -c web-ui/gunicorn.conf.py app_aws:app
+"""
+
+import os
+
+# Run from web-ui/ so app_aws and its templates resolve
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# Requests mostly wait on DynamoDB, Lambda and SMTP, so each worker runs threads
+workers = int(os.environ.get('GUNICORN_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Keep client connections longer than the proxy in front does
+keepalive = 65
+timeout = 60
+
+# Import the app once, then fork workers from it
+preload_app = True
@@ -0,0 +1,54 @@
+"""
+ETag revalidation for the HTML pages when Flask-Compress rewrites the ETag
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_aws
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_aws.db, 'get_summary', lambda: None)
+    monkeypatch.setattr(app_aws.db, 'get_all_bills', lambda **kwargs: [])
+    monkeypatch.setattr(app_aws, 'load_settings', lambda: {})
+    return app_aws.app.test_client()
+
+
+def test_gzip_etag_revalidates(client):
+    first = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert first.status_code == 200
+    assert first.headers['Content-Encoding'] == 'gzip'
+    etag = first.headers['ETag']
+    assert etag.endswith(':gzip"')
+    
+    second = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+
+
+def test_plain_etag_revalidates(client):
+    first = client.get('/')
+    assert first.status_code == 200
+    assert 'Content-Encoding' not in first.headers
+    
+    second = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+
+def test_changed_page_is_resent(client):
+    first = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    
+    second = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"stale:gzip"'})
+    assert second.status_code == 200
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_health_is_publicly_cacheable(client):
+    response = client.get('/health')
+    assert response.headers['Cache-Control'] == 'public, max-age=60, must-revalidate'